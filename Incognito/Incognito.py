@@ -1,18 +1,41 @@
 import csv
+import os
+import pickle
 import sys
-from io import StringIO
+from array import array
+import numpy as np
 import graph
 import parsing
 from dgh import CsvDGH
-import copy
+from frequency import FrequencyCache, FrequencySet, combine_codes
+from instrumentation import Instrumentation
+from metrics import METRICS
+import heapq
 import itertools
+from itertools import repeat
 from datetime import datetime
 import argparse
+import cProfile
+import json
+import pstats
+
+ROWS_BATCH_SIZE = 65536
+"""
+Number of rows generalized at a time when writing the output.
+"""
+OUTPUT_BUFFER_SIZE = 1 << 20
+"""
+Size in bytes of the buffer of the output file.
+"""
+FREQUENCY_CACHE_SIZE = 256 << 20
+"""
+Default maximum size in bytes of the frequency sets cached by a table.
+"""
 
 
 class _Table:
 
-    def __init__(self, pt_path: str, dgh_paths: dict):
+    def __init__(self, pt_path: str, dgh_paths: dict, dgh_cache=None, instrumentation=None):
 
         """
         Instantiates a table and the specified Domain Generalization Hierarchies from the
@@ -21,38 +44,88 @@ class _Table:
         :param pt_path:             Path to the table to anonymize.
         :param dgh_paths:           Dictionary whose values are paths to DGH files and whose keys
                                     are the corresponding attribute names.
+        :param dgh_cache:           Directory of the compiled DGHs, None to always parse the DGH
+                                    files.
+        :param instrumentation:     Instrumentation collecting the timings and counters of the
+                                    table loading and of the anonymizations, None for a new one.
         :raises IOError:            If a file cannot be read.
         :raises FileNotFoundError:  If a file cannot be found.
+        :raises KeyError:           If an attribute with a DGH is not part of the table.
         """
 
-        self.table = None
+        self.instrumentation = instrumentation if instrumentation is not None \
+            else Instrumentation()
         """
-        Reference to the table file.
+        Instrumentation collecting the timings and counters of the table loading and of the
+        anonymizations.
         """
         self.attributes = dict()
         """
         Dictionary whose keys are the table attributes names and whose values are the corresponding
         column indices.
         """
-        self._init_table(pt_path)
+        self.size = 0
         """
-        Reference to the table file.
+        Number of rows of the table.
+        """
+        self.domains = dict()
+        """
+        Dictionary whose keys are the table attributes names and whose values are dictionaries
+        mapping each distinct value of the column to its integer code.
+        """
+        self.values = dict()
+        """
+        Dictionary whose keys are the table attributes names and whose values are the lists of the
+        distinct values of the columns, indexed by their codes.
+        """
+        self.columns = dict()
+        """
+        Dictionary whose keys are the table attributes names and whose values are arrays with the
+        codes of the values of the columns, one per row.
+        """
+        self.weights = None
+        """
+        Array of the number of rows of the table file each row of the columns stands for, None if
+        the columns hold every row of the file.
+        """
+        self.frequency_cache = FrequencyCache(FREQUENCY_CACHE_SIZE)
+        """
+        Cache of the frequency sets of the lattice nodes of any QI combination, shared by the
+        searches of this table. It can be replaced by a cache of another size.
+        """
+        with self.instrumentation.phase('table_load'):
+            self._init_table(pt_path)
+        self.instrumentation.count('rows', self.size)
+        self.dgh_cache = dgh_cache
+        """
+        Directory of the compiled DGHs, None to always parse the DGH files.
         """
         self.dghs = dict()
         """
         Dictionary whose values are DGH instances and whose keys are the corresponding attribute 
         names.
         """
-        for attribute in dgh_paths:
-            self._add_dgh(dgh_paths[attribute], attribute)
-
-    def __del__(self):
-
+        with self.instrumentation.phase('dgh_load'):
+            for attribute in dgh_paths:
+                self._add_dgh(dgh_paths[attribute], attribute)
+        self.gen_codes = dict()
         """
-        Closes the table file.
+        Dictionary whose keys are the names of the attributes with a DGH and whose values are
+        arrays whose row l maps the code of a value to the code of its level l generalization.
         """
-
-        self.table.close()
+        self.gen_values = dict()
+        """
+        Dictionary whose keys are the names of the attributes with a DGH and whose values are lists
+        whose item l is the list of the level l generalized values, indexed by their codes.
+        """
+        self.gen_nested = dict()
+        """
+        Dictionary whose keys are the names of the attributes with a DGH and whose values are
+        boolean arrays whose item [l, m] is True if the level l values determine their level m
+        generalization, that is if level l equivalence classes can be rolled up to level m.
+        """
+        with self.instrumentation.phase('dgh_encoding'):
+            self._init_generalizations()
 
     @staticmethod
     def _log(content, enabled=True, endl=True):
@@ -83,10 +156,45 @@ class _Table:
         if enabled:
             print(content)
 
+    def __getstate__(self):
+
+        # The instrumentation may hold a callback which cannot be saved, and the cached frequency
+        # sets are not worth the space:
+        state = self.__dict__.copy()
+        del state['instrumentation']
+        state['frequency_cache'] = FrequencyCache(self.frequency_cache.max_bytes)
+        return state
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self.instrumentation = Instrumentation()
+
+    def _extend(self, codes: dict):
+
+        """
+        Appends rows to the columns of the table, whose new values have already been added to
+        the domains, and encodes the new values at every generalization level. The codes of the
+        values already in the table do not change.
+
+        :param codes:       Dictionary whose keys are the table attributes names and whose values
+                            are arrays with the codes of the values of the new rows.
+        :raises KeyError:   If a new value is not part of its DGH domain.
+        """
+
+        for attribute in self.attributes:
+            self.values[attribute] = list(self.domains[attribute])
+            self.columns[attribute] = np.concatenate((self.columns[attribute],
+                                                      np.asarray(codes[attribute], np.intc)))
+        self.size = len(self.columns[next(iter(self.attributes))]) if self.attributes else 0
+        self.frequency_cache.clear()
+        with self.instrumentation.phase('dgh_encoding'):
+            self._init_generalizations()
+
     def _init_table(self, pt_path: str):
 
         """
-        Gets a reference to the table file and instantiates the attribute dictionary.
+        Reads the table file once and keeps its columns in memory, dictionary encoded.
 
         :param pt_path:             Path to the table file.
         :raises IOError:            If the file cannot be read.
@@ -94,36 +202,313 @@ class _Table:
         """
 
         try:
-            self.table = open(pt_path, 'r')
+            with open(pt_path, 'r') as table:
+                rows = self._read_rows(table)
+                codes = [array('i') for _ in self.attributes]
+                domains = [dict() for _ in self.attributes]
+                for row in rows:
+                    for i, value in enumerate(row):
+                        code = domains[i].get(value)
+                        if code is None:
+                            code = domains[i][value] = len(domains[i])
+                        codes[i].append(code)
+                    self.size += 1
         except FileNotFoundError:
             raise
+        except IOError:
+            raise
 
-    def _get_values(self, row: str, attributes: list, row_index=None):
+        for attribute, i in self.attributes.items():
+            self.domains[attribute] = domains[i]
+            self.values[attribute] = list(domains[i])
+            self.columns[attribute] = np.frombuffer(codes[i], dtype=np.intc)
+
+    def _init_generalizations(self):
 
         """
-        Gets the values corresponding to the given attributes from a row.
+        Precomputes, for every attribute with a DGH, the codes of its distinct values generalized
+        to every level of the hierarchy.
 
-        :param row:         Line of the table file.
-        :param attributes:  Names of the attributes to get the data of.
-        :param row_index:   Index of the row in the table file.
-        :return:            List of corresponding values if valid, None if this row must be ignored.
-        :raises KeyError:   If an attribute name is not valid.
-        :raises IOError:    If the row cannot be read.
+        :raises KeyError:   If an attribute is not part of the table or one of its values is not
+                            part of its DGH domain.
         """
 
-        # Ignore empty lines:
-        if row.strip() == '':
-            return None
+        for attribute in self.dghs:
+            codes, values = self.dghs[attribute].encode_levels(self.values[attribute])
+            self.gen_codes[attribute] = codes
+            self.gen_values[attribute] = values
+
+            # Different nodes of a hierarchy may share the same value, so a value does not
+            # always determine its generalizations:
+            nested = np.zeros((len(codes), len(codes)), dtype=bool)
+            for low in range(len(codes)):
+                for high in range(low, len(codes)):
+                    pairs = codes[low].astype(np.int64) * len(values[high]) + codes[high]
+                    nested[low, high] = len(np.unique(pairs)) == len(values[low])
+            self.gen_nested[attribute] = nested
+
+    def find_generalizations(self, qi_names: list, ks: list, workers=1, metric='height',
+                             max_suppression=None, state=None, strategy='incognito'):
+
+        """
+        Finds the minimal k-anonymous generalizations of this table, for several levels of
+        anonymity at once: the frequency sets of the lattice nodes are computed once and shared
+        by all of them.
+
+        :param qi_names:        List of names of the Quasi Identifiers attributes to consider
+                                during k-anonymization.
+        :param ks:              List of levels of anonymity.
+        :param workers:         Number of worker processes checking the lattices, 1 to check
+                                them in this process. Only the incognito strategy uses them.
+        :param metric:          Information loss metric choosing among the minimal k-anonymous
+                                generalizations, the name of one of the metrics module or a
+                                function with the same arguments.
+        :param max_suppression: Maximum number of suppressed rows, as a number or as a
+                                percentage of the rows of the table like '5%', None to suppress
+                                at most k rows.
+        :param state:           Search state keeping the frequency sets of the nodes between
+                                runs, brought up to date with the rows appended since the last
+                                one, None not to keep them.
+        :param strategy:        Name of the lattice search strategy, one of STRATEGIES.
+        :return:                Dictionary whose keys are the levels of anonymity and whose
+                                values are the lists of the minimal k-anonymous generalization
+                                levels, ordered as the QI, the best one first.
+        :raises KeyError:       If a QI attribute name, the metric name or the strategy name is
+                                not valid.
+        :raises ValueError:     If no generalization of the table is k-anonymous for a value of
+                                k, or if the maximum number of suppressed rows is not valid.
+        """
+
+        max_suppression = suppression_limit(max_suppression, self.size)
+        search = STRATEGIES[strategy]
+        if state is not None:
+            with self.instrumentation.phase('state_update'):
+                state.update(self)
+
+        # GET HEIGHTS OF QI
+        qi_heights = list()
+
+        for qi in qi_names:
+            tmp = list()
+            for n in range(self.dghs[qi].get_tree_height() + 1):
+                tmp.append(n)
+            qi_heights.append(tmp)
+
+        heights = dict()
+        h = 0
+        for hi in qi_names:
+            heights[hi] = qi_heights[h]
+            h = h + 1
+        instrumentation = self.instrumentation
+        cache_stats = self.frequency_cache.stats()
+        if workers > 1 and search is incognito_search:
+            # Imported here, multiprocessing being slow to import for the runs without workers:
+            from parallel import WorkerPool
+            with instrumentation.phase('worker_start'):
+                pool = WorkerPool(self, qi_names, workers)
+            with pool:
+                k_anon_queues = search(self, qi_names, heights, ks, pool, max_suppression,
+                                       instrumentation, state)
+        else:
+            k_anon_queues = search(self, qi_names, heights, ks, None, max_suppression,
+                                   instrumentation, state)
+        for name, value in self.frequency_cache.stats().items():
+            if name in ('hits', 'projections', 'misses', 'evictions'):
+                instrumentation.count('frequency_cache_' + name, value - cache_stats[name])
 
-    def _set_values(self, row, values, attributes: list) -> str:
+        with instrumentation.phase('solution_ranking'):
+            return {k: find_min(self, k_anon_queues[k], qi_names, k, metric) for k in ks}
 
+    def _suppress(self, levels: dict, k: int, v=False):
+
+        """
+        Finds the rows to suppress in a generalization of the table, counting them.
+
+        :param levels:  Dictionary whose keys are the names of the attributes to generalize and
+                        whose values are the corresponding generalization levels.
+        :param k:       Level of anonymity.
+        :param v:       If True logs the number of suppressed rows.
+        :return:        Bitmap of the rows of the columns to suppress, as in _suppressed_rows.
         """
-        Sets the values of a row for the given attributes and returns the row as a formatted string.
 
-        :param row:         List of values of the row.
-        :param values:      Values to set.
-        :param attributes:  Names of the attributes to set.
-        :return:            The new row as a formatted string.
+        suppressed, suppressed_count = self._suppressed_rows(levels, k)
+        self._log("[LOG] Suppressed rows: %d" % suppressed_count, enabled=v)
+        self.instrumentation.count('suppressed_rows', suppressed_count, k)
+        return suppressed
+
+    def generalized_rows(self, levels: dict, k: int, suppress='drop', v=False):
+
+        """
+        Generalizes the rows of the table, suppressing the ones of the equivalence classes
+        smaller than k.
+
+        :param levels:      Dictionary whose keys are the names of the attributes to generalize
+                            and whose values are the corresponding generalization levels.
+        :param k:           Level of anonymity.
+        :param suppress:    'drop' to leave the suppressed rows out, 'star' to replace the values
+                            of their generalized attributes with '*'.
+        :param v:           If True logs the number of suppressed rows.
+        :return:            Iterator over the generalized rows, as sequences of values ordered
+                            as the attributes.
+        """
+
+        return self._generalize_rows(levels, self._suppress(levels, k, v), suppress)
+
+    def generalized_columns(self, levels: dict, k: int, suppress='drop'):
+
+        """
+        Generalizes the columns of the table, suppressing the rows of the equivalence classes
+        smaller than k.
+
+        :param levels:      Dictionary whose keys are the names of the attributes to generalize
+                            and whose values are the corresponding generalization levels.
+        :param k:           Level of anonymity.
+        :param suppress:    'drop' to leave the suppressed rows out, 'star' to replace the values
+                            of their generalized attributes with '*'.
+        :return:            Dictionary whose keys are the attributes names and whose values are
+                            arrays of the generalized values of the columns.
+        """
+
+        # The whole columns are generalized, so a mask of all the rows is not an issue:
+        suppressed = np.unpackbits(self._suppress(levels, k), count=self.size).astype(bool)
+        columns = dict()
+        for attribute in self.attributes:
+            codes = self.columns[attribute]
+            if suppress == 'drop':
+                codes = codes[~suppressed]
+            if attribute in levels:
+                values = self.gen_values[attribute][levels[attribute]]
+                codes = self.gen_codes[attribute][levels[attribute]][codes]
+            else:
+                values = self.values[attribute]
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+            column = column[codes]
+            if suppress == 'star' and attribute in levels:
+                column[suppressed] = '*'
+            columns[attribute] = column
+        return columns
+
+    def _read_rows(self, table):
+
+        """
+        Parses the table file, initializing the attribute dictionary.
+
+        :param table:       Table file.
+        :return:            Iterable over the rows of the table, as lists of values ordered as the
+                            attributes.
+        :raises IOError:    If the file cannot be read.
+        """
+
+        pass
+
+    def _suppressed_rows(self, levels: dict, k: int):
+
+        """
+        Finds the rows of the equivalence classes smaller than k of a generalization of the table.
+        The class sizes are the ones of the frequency set of the node, usually cached by the
+        search, and the rows are matched with the small classes a batch at a time, so that the
+        only array of the size of the table is a bitmap with one bit per row.
+
+        :param levels:  Dictionary whose keys are the names of the attributes to generalize and
+                        whose values are the corresponding generalization levels.
+        :param k:       Level of anonymity.
+        :return:        Couple (bitmap of the rows of the columns to suppress, as an array of
+                        bytes packed by np.packbits, number of rows of the table they stand for).
+        """
+
+        attributes = list(levels)
+        node = tuple(levels[attribute] for attribute in attributes)
+        size = len(self.columns[attributes[0]])
+        bitmap = np.zeros((size + 7) // 8, dtype=np.uint8)
+
+        frequency = self.frequency_cache.get(self, attributes, node)
+        if frequency is None:
+            frequency = FrequencySet.from_table(self, attributes).roll_up(self, node)
+        small = frequency.counts < k
+        count = int(frequency.counts[small].sum())
+        if count == 0:
+            return bitmap, 0
+
+        cardinalities = [len(self.gen_values[attribute][level])
+                         for attribute, level in zip(attributes, node)]
+
+        def keys(codes):
+            return combine_codes([self.gen_codes[attribute][level][qi_codes]
+                                  for attribute, level, qi_codes in zip(attributes, node, codes)],
+                                 cardinalities)
+
+        representatives = [qi_codes[small] for qi_codes in frequency.codes]
+        if np.prod(cardinalities, dtype=float) >= 2 ** 62:
+            # The keys are compacted, so they can only be compared within a single call:
+            all_keys = keys([np.concatenate((qi_codes, self.columns[attribute]))
+                             for attribute, qi_codes in zip(attributes, representatives)])
+            mask = np.isin(all_keys[len(representatives[0]):], all_keys[:len(representatives[0])])
+            return np.packbits(mask), count
+
+        small_keys = np.sort(keys(representatives))
+        # ROWS_BATCH_SIZE being a multiple of 8, every batch fills whole bytes of the bitmap:
+        for start in range(0, size, ROWS_BATCH_SIZE):
+            batch = slice(start, start + ROWS_BATCH_SIZE)
+            batch_keys = keys([self.columns[attribute][batch] for attribute in attributes])
+            positions = np.minimum(np.searchsorted(small_keys, batch_keys), len(small_keys) - 1)
+            mask = small_keys[positions] == batch_keys
+            bitmap[start // 8:(start + len(mask) + 7) // 8] = np.packbits(mask)
+        return bitmap, count
+
+    def _generalize_rows(self, levels: dict, suppressed=None, suppress='drop'):
+
+        """
+        Generalizes the rows of the table, a batch of rows at a time.
+
+        :param levels:      Dictionary whose keys are the names of the attributes to generalize
+                            and whose values are the corresponding generalization levels.
+        :param suppressed:  Bitmap of the rows of the columns to suppress, as returned by
+                            _suppressed_rows, None to suppress no row.
+        :param suppress:    'drop' to leave the suppressed rows out, 'star' to replace the values
+                            of their generalized attributes with '*'.
+        :return:            Iterator over the generalized rows, as lists of values ordered as the
+                            attributes.
+        """
+
+        for start in range(0, self.size, ROWS_BATCH_SIZE):
+            batch = slice(start, start + ROWS_BATCH_SIZE)
+            dropped = starred = list()
+            if suppressed is not None:
+                # Indices, within the batch, of its suppressed rows:
+                batch_suppressed = np.flatnonzero(np.unpackbits(
+                    suppressed[start // 8:(start + ROWS_BATCH_SIZE) // 8],
+                    count=min(ROWS_BATCH_SIZE, self.size - start)))
+                if suppress == 'drop':
+                    dropped = batch_suppressed
+                else:
+                    starred = batch_suppressed.tolist()
+            columns = list()
+            for attribute in self.attributes:
+                codes = self.columns[attribute][batch]
+                if len(dropped) > 0:
+                    codes = np.delete(codes, dropped)
+                if attribute in levels:
+                    # Recode the rows directly with the generalization codes of their values:
+                    values = self.gen_values[attribute][levels[attribute]]
+                    codes = self.gen_codes[attribute][levels[attribute]][codes]
+                else:
+                    values = self.values[attribute]
+                column = [values[code] for code in codes.tolist()]
+                if attribute in levels:
+                    for i in starred:
+                        column[i] = '*'
+                columns.append(column)
+            yield from zip(*columns)
+
+    def _write_rows(self, output, rows):
+
+        """
+        Writes rows on the output file.
+
+        :param output:      Output file.
+        :param rows:        Iterable over the rows, as lists of values ordered as the attributes.
+        :raises IOError:    If the output file cannot be written.
         """
 
         pass
@@ -144,456 +529,1279 @@ class _Table:
 
 class CsvTable(_Table):
 
-    def __init__(self, pt_path: str, dgh_paths: dict):
-
-        super().__init__(pt_path, dgh_paths)
-
-    def __del__(self):
+    def __init__(self, pt_path: str, dgh_paths: dict, dgh_cache=None, instrumentation=None):
 
-        super().__del__()
+        super().__init__(pt_path, dgh_paths, dgh_cache, instrumentation)
 
     def anonymize(self, qi_names, k, output_path, v=False):
 
         super().anonymize(qi_names, k, output_path, v)
 
-    def _init_table(self, pt_path):
+    def _read_rows(self, table):
+
+        super()._read_rows(table)
 
-        super()._init_table(pt_path)
+        csv_reader = csv.reader(table)
 
         try:
             # Try to read the first line (which contains the attribute names):
-            csv_reader = csv.reader(StringIO(next(self.table)))
+            header = next(csv_reader)
         except IOError:
             raise
 
         # Initialize the dictionary of table attributes:
-        for i, attribute in enumerate(next(csv_reader)):
+        for i, attribute in enumerate(header):
             self.attributes[attribute] = i
 
-    def _get_values(self, row: str, attributes: list, row_index=None):
+        # Ignore empty lines:
+        return (row for row in csv_reader if row)
 
-        super()._get_values(row, attributes, row_index)
+    def append(self, pt_path: str):
 
-        # Ignore the first line (which contains the attribute names):
-        if row_index is not None and row_index == 0:
-            return None
+        """
+        Appends the rows of another table file, with the same attributes, to this table.
 
-        # Try to parse the row:
+        :param pt_path:             Path to the file of the rows to append.
+        :raises IOError:            If the file cannot be read.
+        :raises FileNotFoundError:  If the file cannot be found.
+        :raises ValueError:         If the attributes of the file are not the ones of the table.
+        :raises KeyError:           If a new value is not part of its DGH domain.
+        """
+
+        attributes = list(self.attributes)
         try:
-            csv_reader = csv.reader(StringIO(row))
+            with open(pt_path, 'r') as table:
+                csv_reader = csv.reader(table)
+                if next(csv_reader, None) != attributes:
+                    raise ValueError("The attributes of '%s' are not the ones of the table."
+                                     % pt_path)
+                codes = [array('i') for _ in attributes]
+                domains = [self.domains[attribute] for attribute in attributes]
+                for row in csv_reader:
+                    if not row:
+                        continue
+                    for i, value in enumerate(row):
+                        code = domains[i].get(value)
+                        if code is None:
+                            code = domains[i][value] = len(domains[i])
+                        codes[i].append(code)
+        except FileNotFoundError:
+            raise
         except IOError:
             raise
-        parsed_row = next(csv_reader)
 
-        values = list()
-        for attribute in attributes:
-            if attribute in self.attributes:
-                values.append(parsed_row[self.attributes[attribute]])
-            else:
-                raise KeyError(attribute)
-
-        return values
-
-    def _set_values(self, row: list, values, attributes: list):
+        self._extend({attribute: np.frombuffer(codes[i], dtype=np.intc)
+                      for i, attribute in enumerate(attributes)})
 
-        for i, attribute in enumerate(attributes):
-            row[self.attributes[attribute]] = values[i]
+    def _write_rows(self, output, rows):
 
-        values = StringIO()
-        csv_writer = csv.writer(values)
-        csv_writer.writerow(row)
+        super()._write_rows(output, rows)
 
-        return values.getvalue()
+        csv_writer = csv.writer(output)
+        csv_writer.writerows(rows)
 
     def _add_dgh(self, dgh_path, attribute):
 
         try:
-            self.dghs[attribute] = CsvDGH(dgh_path)
+            self.dghs[attribute] = CsvDGH(dgh_path, self.dgh_cache)
         except FileNotFoundError:
             raise
         except IOError:
             raise
 
-    def anonymize(self, qi_names: list, k: int, output: str, v=True):
+    def anonymize(self, qi_names: list, k, output: str, v=True, workers=1, metric='height',
+                  max_suppression=None, suppress='drop', state=None, strategy='incognito'):
 
         """
-        Writes a k-anonymous representation of this table on a new file. The maximum number of
-        suppressed rows is k.
+        Writes a k-anonymous representation of this table on a new file. The rows of the
+        equivalence classes smaller than k are suppressed, up to a maximum number. Several values
+        of k can be given: the frequency sets of the lattice nodes are then computed once and
+        shared by all of them, and a file is written for every value.
 
         :param qi_names:    List of names of the Quasi Identifiers attributes to consider during
                             k-anonymization.
-        :param k:           Level of anonymity.
-        :param output_path: Path to the output file.
+        :param k:           Level of anonymity, or list of levels of anonymity.
+        :param output:      Path to the output file. With several values of k, it can contain
+                            a '{k}' placeholder, otherwise '_<k>' is added before the extension.
         :param v:           If True prints some logging.
-        :raises KeyError:   If a QI attribute name is not valid.
-        :raises IOError:    If the output file cannot be written.
+        :param workers:     Number of worker processes checking the lattices, 1 to check them
+                            in this process. The timings and counters of the search are collected
+                            by the instrumentation of the table.
+        :param metric:      Information loss metric choosing among the minimal k-anonymous
+                            generalizations, the name of one of the metrics module or a function
+                            with the same arguments.
+        :param max_suppression: Maximum number of suppressed rows, as a number or as a percentage
+                            of the rows of the table like '5%', None to suppress at most k rows.
+        :param suppress:    'drop' to leave the suppressed rows out of the output, 'star' to
+                            replace the values of their QI with '*'.
+        :param state:       Search state of a previous anonymization of this table, as in
+                            find_generalizations, None not to keep it.
+        :param strategy:    Name of the lattice search strategy, one of STRATEGIES.
+        :return:            Dictionary whose keys are the levels of anonymity and whose values
+                            are the lists of the minimal k-anonymous generalization levels, ordered
+                            as the QI, the written one first.
+        :raises KeyError:   If a QI attribute name, the metric name or the strategy name is not
+                            valid.
+        :raises ValueError: If no generalization of the table is k-anonymous for a value of k, or
+                            if the maximum number of suppressed rows is not valid.
+        :raises IOError:    If an output file cannot be written.
         """
 
+        ks = [k] if isinstance(k, int) else list(dict.fromkeys(k))
+        outputs = [output.replace('{k}', str(k))] if isinstance(k, int) \
+            else [output_path(output, k) for k in ks]
+
+        # Find all the solutions before writing, not to leave some of the files behind:
+        data = self.find_generalizations(qi_names, ks, workers, metric, max_suppression, state,
+                                         strategy)
+
+        for k, output in zip(ks, outputs):
+            levels = data[k][0]
+            if len(ks) > 1:
+                self._log("[LOG] k = %d" % k, enabled=v)
+            self._log("[LOG] Minimal generalizations: %d" % len(data[k]), enabled=v)
+            self._log("[LOG] Generalization levels: %s"
+                      % parsing.reparse_attr(dict(zip(qi_names, levels))), enabled=v)
+
+            try:
+                output = open(output, 'w', buffering=OUTPUT_BUFFER_SIZE)
+            except IOError:
+                raise
+
+            with self.instrumentation.phase('output_write', k):
+                rows = self.generalized_rows(dict(zip(qi_names, levels)), k, suppress, v)
+                self._write_rows(output, rows)
+
+                output.close()
+
+        return data
+
+
+class ChunkedCsvTable(CsvTable):
+
+    def __init__(self, pt_path: str, dgh_paths: dict, chunk_size: int, dgh_cache=None,
+                 instrumentation=None):
+
+        """
+        Instantiates a table which is never loaded in memory as a whole: the file is read a chunk
+        of rows at a time, keeping only the distinct sequences of values of the attributes with a
+        DGH and their number of occurrences. The memory needed depends on the number of distinct
+        sequences, not on the number of rows. The rows are read again when writing the output.
+
+        :param pt_path:             Path to the table to anonymize.
+        :param dgh_paths:           Dictionary whose values are paths to DGH files and whose keys
+                                    are the corresponding attribute names.
+        :param chunk_size:          Number of rows read at a time.
+        :param dgh_cache:           Directory of the compiled DGHs, None to always parse the DGH
+                                    files.
+        :param instrumentation:     Instrumentation collecting the timings and counters of the
+                                    table loading and of the anonymizations, None for a new one.
+        :raises IOError:            If a file cannot be read.
+        :raises FileNotFoundError:  If a file cannot be found.
+        :raises KeyError:           If an attribute with a DGH is not part of the table.
+        """
+
+        self.pt_path = pt_path
+        """
+        Path to the table file.
+        """
+        self.chunk_size = chunk_size
+        """
+        Number of rows read at a time.
+        """
+        self.appended_paths = list()
+        """
+        Paths to the files of the rows appended to the table, read again after the table file
+        when writing the output.
+        """
+        self._encoded = list(dgh_paths)
+        """
+        Names of the attributes whose columns are kept.
+        """
+        super().__init__(pt_path, dgh_paths, dgh_cache, instrumentation)
+
+    def _init_table(self, pt_path):
+
+        for attribute in self._encoded:
+            self.domains[attribute] = dict()
+            self.columns[attribute] = np.zeros(0, dtype=np.intc)
+        self.weights = np.zeros(0, dtype=np.int64)
+
         try:
-            output = open(output, 'w')
+            with open(pt_path, 'r') as table:
+                self._merge_rows(self._read_rows(table))
+        except FileNotFoundError:
+            raise
         except IOError:
             raise
 
-        self.table.seek(0)
+    def _merge_rows(self, rows):
 
-        # qi_frequency Dictionary whose keys are sequences of values for the Quasi Identifiers and whose values
-        # are couples (n, s) where n is the number of occurrences of a sequence and s is a set
-        # containing the indices of the rows in the original table file with those QI values:
-        # K = Tuple ("a","b","c") aka QI_seq, V = (int rep, set {"row_index_1","row_index_n"})
+        """
+        Reads rows a chunk at a time, adding them to the distinct sequences of values of the
+        attributes with a DGH and to their number of occurrences.
 
-        k_anon_queue = dict()
+        :param rows:    Iterable over the rows, as lists of values ordered as the attributes.
+        """
 
-        # GET HEIGHTS OF QI
-        qi_heights = list()
+        indices = [self.attributes[attribute] for attribute in self._encoded]
+        domains = [self.domains[attribute] for attribute in self._encoded]
+        codes = [self.columns[attribute] for attribute in self._encoded]
+        weights = self.weights
+
+        for chunk in iter(lambda: list(itertools.islice(rows, self.chunk_size)), []):
+            # Encode the chunk and append it to the distinct sequences found so far:
+            for i, domain in enumerate(domains):
+                chunk_codes = [domain.setdefault(row[indices[i]], len(domain)) for row in chunk]
+                codes[i] = np.concatenate((codes[i], np.array(chunk_codes, np.intc)))
+            weights = np.concatenate((weights, np.ones(len(chunk), dtype=np.int64)))
+            self.size += len(chunk)
+
+            # Merge the equal sequences:
+            keys = combine_codes(codes, [len(domain) for domain in domains])
+            _, first_rows, sequences = np.unique(keys, return_index=True, return_inverse=True)
+            weights = np.bincount(sequences.ravel(), weights=weights).astype(np.int64)
+            codes = [qi_codes[first_rows] for qi_codes in codes]
+
+        for i, attribute in enumerate(self._encoded):
+            self.values[attribute] = list(domains[i])
+            self.columns[attribute] = codes[i]
+        self.weights = weights
+
+    def _generalize_rows(self, levels: dict, suppressed=None, suppress='drop'):
+
+        # Sequences of values of the rows to suppress:
+        indices = [self.attributes[attribute] for attribute in self._encoded]
+        suppressed_rows = set()
+        if suppressed is not None:
+            mask = np.unpackbits(suppressed, count=len(self.columns[self._encoded[0]])).astype(bool)
+            sequences = [[self.values[attribute][code]
+                          for code in self.columns[attribute][mask].tolist()]
+                         for attribute in self._encoded]
+            suppressed_rows = set(zip(*sequences))
+        starred = [self.attributes[attribute] for attribute in levels]
+
+        # Generalized value of every distinct value of the attributes to generalize:
+        generalizations = dict()
+        for attribute, level in levels.items():
+            values = self.gen_values[attribute][level]
+            codes = self.gen_codes[attribute][level]
+            generalizations[self.attributes[attribute]] = \
+                {value: values[codes[code]] for value, code in self.domains[attribute].items()}
 
-        for qi in qi_names:
-            tmp = list()
-            for n in range(CsvDGH.get_tree_height(table.dghs[qi]) + 1):
-                tmp.append(n)
-            qi_heights.append(tmp)
+        try:
+            for path in [self.pt_path] + self.appended_paths:
+                with open(path, 'r') as table:
+                    for row in self._read_rows(table):
+                        if suppressed_rows and tuple(row[i] for i in indices) in suppressed_rows:
+                            if suppress == 'drop':
+                                continue
+                            for i in starred:
+                                row[i] = '*'
+                            yield row
+                            continue
+                        for i, generalization in generalizations.items():
+                            row[i] = generalization[row[i]]
+                        yield row
+        except IOError:
+            raise
 
-        heights = dict()
-        h = 0
-        for hi in qi_names:
-            heights[hi] = qi_heights[h]
-            h = h + 1
-        # call the function mono and multi
-        mono_attr_verify(self, qi_names, heights, k, table.dghs, k_anon_queue)
-        multi_attr_verify(qi_names, heights, k_anon_queue)
+    def generalized_columns(self, levels: dict, k: int, suppress='drop'):
+
+        # The rows are not kept in memory, the columns are collected from the rows read again:
+        columns = [list() for _ in self.attributes]
+        for row in self._generalize_rows(levels, self._suppress(levels, k), suppress):
+            for column, value in zip(columns, row):
+                column.append(value)
+        return {attribute: np.array(columns[i], dtype=object)
+                for i, attribute in enumerate(self.attributes)}
+
+    def append(self, pt_path: str):
 
-        qi_frequency = find_min(self, k_anon_queue, qi_names, table.dghs)
+        attributes = list(self.attributes)
+        try:
+            with open(pt_path, 'r') as table:
+                csv_reader = csv.reader(table)
+                if next(csv_reader, None) != attributes:
+                    raise ValueError("The attributes of '%s' are not the ones of the table."
+                                     % pt_path)
+                self._merge_rows(row for row in csv_reader if row)
+        except FileNotFoundError:
+            raise
+        except IOError:
+            raise
 
-        # Start to read the table file from the start:
-        self.table.seek(0)
+        self.appended_paths.append(pt_path)
+        self.frequency_cache.clear()
+        with self.instrumentation.phase('dgh_encoding'):
+            self._init_generalizations()
 
-        for i, row in enumerate(self.table):
 
-            table_row = self._get_values(row, list(self.attributes), i)
+class MemoryTable(_Table):
 
-            # Skip this row if it must be ignored:
-            if table_row is None:
-                continue
+    def __init__(self, data, dghs: dict, header=None, instrumentation=None):
+
+        """
+        Instantiates a table from rows or columns already in memory and from DGH instances
+        already built, to anonymize it without reading or writing any file.
+
+        :param data:                Dictionary whose keys are the attributes names and whose
+                                    values are sequences or arrays with the values of the
+                                    columns, or iterable over the rows, as sequences of values
+                                    ordered as the header. The values of the attributes with a
+                                    DGH are compared with the DGH values as strings.
+        :param dghs:                Dictionary whose values are DGH instances and whose keys are
+                                    the corresponding attribute names.
+        :param header:              List of the attributes names of the rows, None if the first
+                                    row is the header. Not used with columns.
+        :param instrumentation:     Instrumentation collecting the timings and counters of the
+                                    table loading and of the anonymizations, None for a new one.
+        :raises KeyError:           If an attribute with a DGH is not part of the table.
+        :raises ValueError:         If the columns do not have the same length.
+        """
+
+        self.header = header
+        """
+        List of the attributes names of the rows, None if the first row is the header.
+        """
+        self._with_dgh = set(dghs)
+        """
+        Names of the attributes whose values are compared with the DGH values.
+        """
+        super().__init__(data, dghs, None, instrumentation)
+
+    def _init_table(self, data):
+
+        if isinstance(data, dict):
+            columns = data
+        else:
+            rows = iter(data)
+            header = self.header if self.header is not None else list(next(rows))
+            # Ignore empty rows:
+            rows = [row for row in rows if len(row) > 0]
+            columns = {attribute: [row[i] for row in rows] for i, attribute in enumerate(header)}
+
+        for i, (attribute, column) in enumerate(columns.items()):
+            self.attributes[attribute] = i
+            column = np.asarray(column)
+            if column.dtype == object:
+                # Values of any type, encoded in order of appearance:
+                domain = dict()
+                codes = np.fromiter((domain.setdefault(value, len(domain))
+                                     for value in column.tolist()), dtype=np.intc,
+                                    count=len(column))
+                values = list(domain)
+            else:
+                values, codes = np.unique(column, return_inverse=True)
+                values = values.tolist()
+                codes = codes.ravel().astype(np.intc)
+            if attribute in self._with_dgh:
+                values = [str(value) for value in values]
+
+            if i > 0 and len(codes) != self.size:
+                raise ValueError("Column '%s' has %d values instead of %d."
+                                 % (attribute, len(codes), self.size))
+            self.size = len(codes)
+            self.domains[attribute] = {value: code for code, value in enumerate(values)}
+            self.values[attribute] = values
+            self.columns[attribute] = codes
+
+    def append(self, data):
+
+        """
+        Appends rows or columns, with the same attributes, to this table.
+
+        :param data:        Columns or rows to append, as in the constructor. Rows have no
+                            header.
+        :raises ValueError: If the attributes are not the ones of the table.
+        :raises KeyError:   If a new value is not part of its DGH domain.
+        """
+
+        if isinstance(data, dict):
+            columns = data
+        else:
+            rows = [row for row in data if len(row) > 0]
+            columns = {attribute: [row[i] for row in rows]
+                       for i, attribute in enumerate(self.attributes)}
+        if set(columns) != set(self.attributes):
+            raise ValueError("The attributes are not the ones of the table.")
+
+        codes = dict()
+        for attribute in self.attributes:
+            domain = self.domains[attribute]
+            values = np.asarray(columns[attribute]).tolist()
+            if attribute in self._with_dgh:
+                values = [str(value) for value in values]
+            codes[attribute] = np.fromiter((domain.setdefault(value, len(domain))
+                                            for value in values), dtype=np.intc,
+                                           count=len(values))
+        self._extend(codes)
+
+    def _add_dgh(self, dgh, attribute):
+
+        self.dghs[attribute] = dgh
+
+
+def k_anonymize(data, dghs: dict, k: int, qi_names=None, header=None, as_columns=False,
+                workers=1, metric='height', max_suppression=None, suppress='drop',
+                strategy='incognito'):
+    """
+    Anonymizes a table in memory, without reading or writing any file.
+
+    :param data:                Columns or rows of the table, as in MemoryTable.
+    :param dghs:                Dictionary whose values are DGH instances and whose keys are the
+                                corresponding attribute names.
+    :param k:                   Level of anonymity.
+    :param qi_names:            List of names of the Quasi Identifiers attributes, None for all
+                                the attributes with a DGH.
+    :param header:              List of the attributes names of the rows, None if the first row
+                                is the header. Not used with columns.
+    :param as_columns:          If True the anonymized table is returned as columns, otherwise as
+                                an iterator over the rows.
+    :param workers:             Number of worker processes checking the lattices, 1 to check
+                                them in this process.
+    :param metric:              Information loss metric choosing among the minimal k-anonymous
+                                generalizations, as in CsvTable.anonymize.
+    :param max_suppression:     Maximum number of suppressed rows, as in CsvTable.anonymize.
+    :param suppress:            'drop' to leave the suppressed rows out, 'star' to replace the
+                                values of their QI with '*'.
+    :param strategy:            Name of the lattice search strategy, one of STRATEGIES.
+
+    :return:                    Couple (tuple of the generalization levels, ordered as the QI,
+                                anonymized table as returned by generalized_rows or
+                                generalized_columns).
+    :raises KeyError:           If a QI attribute name, the metric name or the strategy name is
+                                not valid.
+    :raises ValueError:         If no generalization of the table is k-anonymous, or if the
+                                maximum number of suppressed rows is not valid.
+    """
+    if qi_names is None:
+        qi_names = list(dghs)
+    table = MemoryTable(data, {qi: dghs[qi] for qi in qi_names}, header)
+
+    levels = table.find_generalizations(qi_names, [k], workers, metric, max_suppression,
+                                        strategy=strategy)[k][0]
+    if as_columns:
+        return levels, table.generalized_columns(dict(zip(qi_names, levels)), k, suppress)
+    return levels, table.generalized_rows(dict(zip(qi_names, levels)), k, suppress)
+
+
+class SearchState:
+
+    def __init__(self):
+
+        """
+        State of the lattice searches of a table, kept between anonymizations so that, when rows
+        are appended to the table, only their frequency sets need to be computed: the ones of the
+        nodes already checked are brought up to date with them, without any pass over the
+        previous rows. Every node is checked again on the updated class sizes: the new rows can
+        add classes smaller than k, so a node which was k anonymous may no longer be, and the
+        other way round.
+        """
+
+        self.frequencies = dict()
+        """
+        Dictionary whose keys are the QI combinations and whose values are dictionaries of the
+        frequency sets of their nodes, as in node_frequency.
+        """
+        self.rows = 0
+        """
+        Number of rows of the table counted by the frequency sets.
+        """
+
+    def update(self, csvtable):
+
+        """
+        Adds the rows appended to a table since the last update to the frequency sets. The cost
+        depends on the number of new rows and on the number of classes, not on the number of
+        rows of the table.
+
+        :param csvtable:    Table whose rows have been appended.
+        :raises TypeError:  If the table is a ChunkedCsvTable, whose rows are merged as they are
+                            read, so that the appended ones cannot be told apart.
+        """
+
+        if isinstance(csvtable, ChunkedCsvTable):
+            raise TypeError("A search state cannot follow a chunked table.")
+        if csvtable.size == self.rows:
+            return
+        new_rows = slice(self.rows, csvtable.size)
+        for combination, frequencies in self.frequencies.items():
+            delta = FrequencySet.from_table(csvtable, combination, new_rows)
+            for node, frequency in frequencies.items():
+                frequencies[node] = frequency.merge(csvtable, delta.roll_up(csvtable, node))
+        self.rows = csvtable.size
 
-            # Find sequence corresponding to this row index:
-            for qi_sequence in qi_frequency:
-                if i in qi_frequency[qi_sequence][1]:  # if index row is in the set of indexes
-                    line = self._set_values(table_row, qi_sequence, qi_names)
-                    print(line, file=output, end="")
-                    break
 
-        output.close()
+def save_state(path, csvtable, state):
+    """
+    Saves a table and the state of its searches, to resume them when rows are appended.
+
+    :param path:                Path to the state file.
+    :param csvtable:            Table.
+    :param state:               Search state of the table.
+
+    :raises IOError:            If the file cannot be written.
+    """
+    try:
+        with open(path, 'wb') as file:
+            pickle.dump((csvtable, state), file, protocol=pickle.HIGHEST_PROTOCOL)
+    except IOError:
+        raise
+
+
+def load_state(path):
+    """
+    Loads a table and the state of its searches saved by save_state.
+
+    :param path:                Path to the state file.
+
+    :return:                    Couple (table, search state).
+    :raises IOError:            If the file cannot be read.
+    :raises FileNotFoundError:  If the file cannot be found.
+    """
+    try:
+        with open(path, 'rb') as file:
+            return pickle.load(file)
+    except FileNotFoundError:
+        raise
+    except IOError:
+        raise
+
+
+def output_path(output, k):
+    """
+    Gets the path of the output file of a level of anonymity.
+
+    :param output:              Path to the output file, which can contain a '{k}' placeholder.
+    :param k:                   Level of anonymity.
+
+    :return:                    The path with the placeholder replaced, or with '_<k>' added
+                                before the extension if there is no placeholder.
+    """
+    if '{k}' in output:
+        return output.replace('{k}', str(k))
+    root, extension = os.path.splitext(output)
+    return "%s_%d%s" % (root, k, extension)
+
+
+def suppression_limit(max_suppression, size):
+    """
+    Gets the maximum number of suppressed rows of a table.
+
+    :param max_suppression:     Maximum number of suppressed rows, as a number or as a string
+                                with a number or a percentage of the rows like '5%', None for
+                                no limit other than k.
+    :param size:                Number of rows of the table.
+
+    :return:                    The maximum number of suppressed rows, None for k.
+    :raises ValueError:         If the maximum is not a valid number or percentage.
+    """
+    if max_suppression is None:
+        return None
+    if isinstance(max_suppression, str):
+        if max_suppression.endswith('%'):
+            max_suppression = int(float(max_suppression[:-1]) * size / 100)
+        else:
+            max_suppression = int(max_suppression)
+    if max_suppression < 0:
+        raise ValueError("The maximum number of suppressed rows cannot be negative.")
+    return max_suppression
 
 
 # check if table is k-anon, if there are less than k sequences that have a repetition lower than k
-def is_k_anon(table, k):
+def is_k_anon(counts, k, max_suppression=None):
     """
-    :param table: table to check anonymization
+    :param counts: array of the sizes of the equivalence classes of the table to check
     :param k: level of anonymization
+    :param max_suppression: maximum number of suppressed touples, None for k
     :return: true if k anonymous false otherwise
     """
-    count = 0  # non k-anon touples count
-    for key in table:
-        if table[key][0] < k:
-            count += table[key][0]
-    return count <= k
-
-
-def generate_frequency(csvtable, qi_names):
-    """
-    :param csvtable: table to check anonymization
-    :param qi_names: names of QI
-    :return: frequency of equal lines in the table
-    """
-
-    csvtable.table.seek(0)
-    qi_frequency = dict()
-    # Initialize qi_frequency
-    for i, row in enumerate(csvtable.table):
-        # i = index row
-        # row value
-        # list of values contained in qi_names at row 'i'
-        qi_sequence = csvtable._get_values(row, qi_names, i)
-
-        # Skip if this row must be ignored:
-        if qi_sequence is not None:
-            # list -> tuple ("val_a","val_b","val_c")
-            qi_sequence = tuple(qi_sequence)
-            # if qi_val_combination in qi_frequency Key
-        if qi_sequence in qi_frequency:
-            # add occurence of qi_sequence
-            occurrences = qi_frequency[qi_sequence][0] + 1
-            # add index
-            rows_set = qi_frequency[qi_sequence][1].union([i])
-            # update value
-            qi_frequency[qi_sequence] = (occurrences, rows_set)
-        else:
-            # Initialize number of occurrences and set of row indices:
-            qi_frequency[qi_sequence] = (1, set())
-            qi_frequency[qi_sequence][1].add(i)
-    return qi_frequency
+    if max_suppression is None:
+        max_suppression = k
+    # non k-anon touples count
+    return int(counts[counts < k].sum()) <= max_suppression
 
 
-def mono_attr_verify(csvtable, qi_names, qi_heights, k, dghs, k_anon_queue):
+def node_frequency(csvtable, qi_names, frequencies, data):
+    """
+    Gets the frequency set of a lattice node, rolling up the one of a parent node when it has
+    already been computed, otherwise the one of a node cached by the table, of the same QI or of
+    more QI, and only as a last resort the original table.
+
+    :param csvtable:            Table to check anonymization.
+    :param qi_names:            Names of QI.
+    :param frequencies:         Dictionary whose keys are generalization levels of the nodes
+                                already computed and whose values are their frequency sets. The
+                                new frequency set is added to it.
+    :param data:                Contains the generalization levels of the node.
+
+    :return:                    The frequency set of the node.
     """
-    Anonimyze monodimensional graph and eventually n-dimensional ones.
 
-    :param csvtable:            Path to the table to anonymize.
-    :param qi_names:            List whose values are names of QI
-    :param qi_heights:          Dictionary containing the heights of every QI, in a range format.
+    data = tuple(data)
+    if data in frequencies:
+        return frequencies[data]
+    # The worker processes do not share the cache of the table:
+    cache = getattr(csvtable, 'frequency_cache', None)
+
+    source = None
+    for i, level in enumerate(data):
+        if level == 0:
+            continue
+        parent = data[:i] + (level - 1,) + data[i + 1:]
+        # Roll up the smallest parent available:
+        if parent in frequencies and (source is None or len(frequencies[parent]) < len(source)) \
+                and frequencies[parent].can_roll_up(csvtable, data):
+            source = frequencies[parent]
+
+    if source is not None:
+        frequency = source.roll_up(csvtable, data)
+    else:
+        frequency = None if cache is None else cache.get(csvtable, qi_names, data)
+        if frequency is None:
+            # No cached node can be projected on the bottom node either, start from the original
+            # table:
+            bottom = (0,) * len(data)
+            if bottom not in frequencies:
+                frequencies[bottom] = FrequencySet.from_table(csvtable, qi_names)
+                if cache is not None:
+                    cache.put(frequencies[bottom])
+            frequency = frequencies[bottom].roll_up(csvtable, data)
+
+    if cache is not None:
+        cache.put(frequency)
+    frequencies[data] = frequency
+    return frequency
+
+
+def lattice_verify(csvtable, qi_names, G, k, frequencies=None, max_suppression=None,
+                   stats=None):
+    """
+    Checks the nodes of a generalization graph bottom up, in order of height. By the
+    generalization property, all the generalizations of a k anonymous node are k anonymous too,
+    so they are marked and never checked.
+
+    :param csvtable:            Table to anonymize.
+    :param qi_names:            List whose values are names of QI, ordered as the node levels.
+    :param G:                   Generalization graph of the QI.
     :param k:                   Level of anonymity.
-    :param dghs:                Dictionary whose values are paths to DGH files and whose keys
-                                are the corresponding attribute names.
-    :param k_anon_queue:        Dictionary containing the k anonymous combination each n-dimensions.
+    :param frequencies:         Dictionary of the frequency sets of the nodes already computed,
+                                as in node_frequency, None to start from scratch.
+    :param max_suppression:     Maximum number of suppressed rows, None for k.
+    :param stats:               Dictionary whose 'nodes_evaluated' and 'nodes_marked' values are
+                                incremented by the number of nodes checked and skipped, None not
+                                to count them.
+
+    :return:                    Dictionary whose keys are the k anonymous nodes of the graph and
+                                whose values are the arrays of the sizes of their equivalence
+                                classes for the minimal ones, None for the others.
     """
-    count = 1
+    k_anon_nodes = dict()
+    # Frequency sets of the nodes already checked:
+    if frequencies is None:
+        frequencies = dict()
+    if stats is None:
+        stats = dict()
+    evaluated = marked = 0
+
+    # Heap of the nodes to visit, ordered by height: a node is visited after all of its parents
+    queue_node = [(sum(n), n) for n in G.getRoots()]
+    heapq.heapify(queue_node)
+    queued = set(n for _, n in queue_node)
+
+    while queue_node:
+
+        # Nodes are tuples of generalization levels (lv1, lv2, ...)
+        _, current = heapq.heappop(queue_node)
+
+        if not G.isMarked(current):
+            evaluated += 1
+            frequency = node_frequency(csvtable, qi_names, frequencies, current)
+            if is_k_anon(frequency.counts, k, max_suppression):
+                # The node is not a generalization of a k anonymous one, so it is minimal:
+                k_anon_nodes[current] = frequency.counts
+                G.setMarked(current)
+                G.setGeneralizationsMarked(current)
+        else:
+            marked += 1
+            k_anon_nodes[current] = None
 
-    while count <= len(qi_names):
+        for n in G.getChildren(current):
+            if n in queued:
+                continue
+            queued.add(n)
+            heapq.heappush(queue_node, (sum(n), n))
 
-        listofcomb = list(itertools.combinations(qi_names, count))
-        # vertex text format "qi_name1 : lv1 ; qi_name2 : lv2 ;..."
-        comb = 0
-        found_k_anon = False
-
-        while comb < len(listofcomb):
-            found_k_anon = False
-            heightxcomb = list()
-            qinamesxcomb = list()
-
-            for hi in list(listofcomb[comb]):
-                qinamesxcomb.append(hi)
-                heightxcomb.append(qi_heights[hi])
-
-            qi_frequency = generate_frequency(csvtable, qinamesxcomb)
-
-            G = graph.MyDiGraph()
-            G.add_vertices(heightxcomb, listofcomb[comb])
-            G.add_linked_edge(qinamesxcomb)
-            queue_node = G.getRoots()
-
-            while True:
-
-                current = queue_node.pop(0)
-
-                if not G.isMarked(current):
-                    data = tuple()
-                    tmp = parsing.parse_attr(current)
-
-                    for i in tmp:
-                        data = data + (int(tmp[i]),)
-
-                    if is_k_anon(generalize(qinamesxcomb, dghs, qi_frequency, *data), k):
-                        found_k_anon = True
-                        if k_anon_queue.get(count):
-                            # "None" is counted as "False"
-                            k_anon_queue[count].append(current)
-                        else:
-                            k_anon_queue[count] = [current]
-                        G.setMarked(current)
-                        if G.getChildren(current):
-                            for n in G.getChildren(current):
-                                G.setMarked(n)
-                                G.setHereditary(n)
-                else:
-                    k_anon_queue[count].append(current)
+    stats['nodes_evaluated'] = stats.get('nodes_evaluated', 0) + evaluated
+    stats['nodes_marked'] = stats.get('nodes_marked', 0) + marked
+    return k_anon_nodes
 
-                # break the loop
-                if not G.getChildren(current):
-                    break
 
-                for n in G.getChildren(current):
-                    if n in queue_node:
-                        continue
-                    queue_node.append(n)
+def verify_combination(csvtable, qinamesxcomb, qi_height, candidates, ks, max_suppression=None,
+                       frequencies=None):
+    """
+    Finds the k anonymous nodes of the generalization graph of a QI combination, for several
+    levels of anonymity. The frequency sets of the nodes are computed once for all of them.
+
+    :param csvtable:            Table to anonymize.
+    :param qinamesxcomb:        Tuple whose values are names of QI.
+    :param qi_height:           List containing the heights of every QI, in a range format.
+    :param candidates:          List of the sets of candidate nodes of every level of anonymity,
+                                None items to check the whole lattice.
+    :param ks:                  List of levels of anonymity.
+    :param max_suppression:     Maximum number of suppressed rows, None for k.
+    :param frequencies:         Dictionary of the frequency sets of the nodes already computed,
+                                as in node_frequency, to keep the new ones in, None not to keep
+                                them.
+
+    :return:                    Triple (list of the k anonymous nodes of the graph, as returned
+                                by lattice_verify, one per level of anonymity, dictionary of
+                                the counters of the check, frequency sets if they are kept,
+                                None otherwise).
+    """
+    keep = frequencies is not None
+    if not keep:
+        frequencies = dict()
+    stats = dict()
+    k_anon_nodes = [lattice_verify(csvtable, qinamesxcomb, graph.Lattice(qi_height, k_candidates),
+                                   k, frequencies, max_suppression, stats)
+                    for k_candidates, k in zip(candidates, ks)]
 
-            comb = comb + 1
+    stats['frequency_sets'] = len(frequencies)
+    stats['frequency_set_classes'] = sum(len(frequency) for frequency in frequencies.values())
+    return k_anon_nodes, stats, frequencies if keep else None
 
-        if found_k_anon:
-            return
 
-        count = count + 1
+def verify_combinations(csvtable, combinations, heights, candidates, ks, pool=None,
+                        max_suppression=None, instrumentation=None, state=None):
+    """
+    Finds the k anonymous nodes of the generalization graphs of independent QI combinations.
+
+    :param csvtable:            Table to anonymize.
+    :param combinations:        List of tuples whose values are names of QI.
+    :param heights:             Dictionary containing the heights of every QI, in a range format.
+    :param candidates:          List, for every combination, of the lists of the sets of
+                                candidate nodes of every level of anonymity, None items to check
+                                the whole lattices.
+    :param ks:                  List of levels of anonymity.
+    :param pool:                Worker pool checking the combinations in parallel, None to check
+                                them in this process.
+    :param max_suppression:     Maximum number of suppressed rows, None for k.
+    :param instrumentation:     Instrumentation collecting the time of the check and its
+                                counters, keyed by the number of QI of the combinations, None
+                                not to collect them.
+    :param state:               Search state keeping the frequency sets of the combinations,
+                                None not to keep them.
+
+    :return:                    List, for every combination, of the lists of the k anonymous
+                                nodes of every level of anonymity, as returned by lattice_verify.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation()
+    qi_heights = [[heights[qi] for qi in qinamesxcomb] for qinamesxcomb in combinations]
+    frequencies = [None] * len(combinations) if state is None \
+        else [state.frequencies.get(qinamesxcomb, dict()) for qinamesxcomb in combinations]
+
+    with instrumentation.phase('lattice_search', len(combinations[0])):
+        if pool is None:
+            results = list(map(verify_combination, repeat(csvtable), combinations, qi_heights,
+                               candidates, repeat(ks), repeat(max_suppression), frequencies))
+        else:
+            results = list(pool.map(verify_combination, combinations, qi_heights, candidates,
+                                    repeat(ks), repeat(max_suppression), frequencies))
+
+    for qinamesxcomb, (_, stats, combination_frequencies) in zip(combinations, results):
+        for name, value in stats.items():
+            instrumentation.count(name, value, len(combinations[0]))
+        if state is not None:
+            state.frequencies[qinamesxcomb] = combination_frequencies
+    return [k_anon_nodes for k_anon_nodes, _, _ in results]
+
+
+def mono_attr_verify(csvtable, qi_names, qi_heights, ks, k_anon_queues, pool=None,
+                     max_suppression=None, instrumentation=None, state=None):
+    """
+    Anonimyze monodimensional graphs.
+
+    :param csvtable:            Table to anonymize.
+    :param qi_names:            List whose values are names of QI
+    :param qi_heights:          Dictionary containing the heights of every QI, in a range format.
+    :param ks:                  List of levels of anonymity.
+    :param k_anon_queues:       Dictionary whose keys are the levels of anonymity and whose values
+                                are dictionaries containing the k anonymous combination each
+                                n-dimensions.
+    :param pool:                Worker pool checking the QI in parallel, None to check them in
+                                this process.
+    :param max_suppression:     Maximum number of suppressed rows, None for k.
+    :param instrumentation:     Instrumentation collecting the timings and counters of the
+                                check, None not to collect them.
+    :param state:               Search state keeping the frequency sets of the nodes, None not
+                                to keep them.
+    """
+    combinations = [(qi,) for qi in qi_names]
+    k_anon_nodes = verify_combinations(csvtable, combinations, qi_heights,
+                                       [[None] * len(ks)] * len(combinations), ks, pool,
+                                       max_suppression, instrumentation, state)
+    for i, k in enumerate(ks):
+        k_anon_queues[k][1] = {combination: nodes[i]
+                               for combination, nodes in zip(combinations, k_anon_nodes)}
 
     return
 
 
-def multi_attr_verify(qi_names, heights, k_anon_queue):
+def generate_candidates(qinamesxcomb, k_anon_queue):
+    """
+    Generates the candidate nodes of a QI combination, joining the k anonymous nodes of two of
+    its subsets with one QI less and pruning the ones with a subset which is not k anonymous.
+
+    :param qinamesxcomb:        Tuple whose values are names of QI, at least two.
+    :param k_anon_queue:        Dictionary containing the k anonymous combination each n-dimensions.
+
+    :return:                    Set of the candidate nodes.
+    """
+    count = len(qinamesxcomb)
+    subsets = k_anon_queue[count - 1]
+
+    # Nodes of the two subsets sharing all the QI but the last one are joined on those levels:
+    last_levels = dict()
+    for node in subsets[qinamesxcomb[:-2] + qinamesxcomb[-1:]]:
+        last_levels.setdefault(node[:-1], list()).append(node[-1])
+
+    candidates = set()
+    for node in subsets[qinamesxcomb[:-1]]:
+        for level in last_levels.get(node[:-1], ()):
+            candidate = node + (level,)
+            # Prune the candidates with a subset which is not k anonymous (the two joined
+            # subsets are already known to be):
+            is_k = True
+            for i in range(count - 2):
+                subset = qinamesxcomb[:i] + qinamesxcomb[i + 1:]
+                if candidate[:i] + candidate[i + 1:] not in subsets[subset]:
+                    is_k = False
+                    break
+            if is_k:
+                candidates.add(candidate)
+
+    return candidates
+
+
+def multi_attr_verify(csvtable, qi_names, heights, ks, k_anon_queues, pool=None,
+                      max_suppression=None, instrumentation=None, state=None):
     """
     Anonimyze multidimensional graph and eventually n-dimensional ones.
 
+    :param csvtable:            Table to anonymize.
     :param qi_names:            List whose values are names of QI
     :param heights:             Dictionary containing the heights of every QI, in a range format.
-    :param k_anon_queue:        Dictionary containing the k anonymous combination each n-dimensions.
+    :param ks:                  List of levels of anonymity.
+    :param k_anon_queues:       Dictionary whose keys are the levels of anonymity and whose values
+                                are dictionaries containing the k anonymous combination each
+                                n-dimensions.
+    :param pool:                Worker pool checking the QI combinations of the same size in
+                                parallel, None to check them in this process.
+    :param max_suppression:     Maximum number of suppressed rows, None for k.
+    :param instrumentation:     Instrumentation collecting the timings and counters of the
+                                check, None not to collect them.
+    :param state:               Search state keeping the frequency sets of the nodes, None not
+                                to keep them.
 
     """
-    count = len(k_anon_queue) + 1
+    if instrumentation is None:
+        instrumentation = Instrumentation()
+    count = 2
     while count <= len(qi_names):
-        listofcomb = list(itertools.combinations(qi_names, count))
-        comb = 0
+        combinations = list(itertools.combinations(qi_names, count))
+
+        # Only the nodes whose subsets are all k anonymous can be k anonymous:
+        with instrumentation.phase('candidate_generation', count):
+            candidates = [[generate_candidates(qinamesxcomb, k_anon_queues[k]) for k in ks]
+                          for qinamesxcomb in combinations]
+        for qinamesxcomb, k_candidates in zip(combinations, candidates):
+            size = 1
+            for qi in qinamesxcomb:
+                size *= len(heights[qi])
+            instrumentation.count('nodes_pruned', sum(size - len(c) for c in k_candidates), count)
+
+        k_anon_nodes = verify_combinations(csvtable, combinations, heights, candidates, ks, pool,
+                                           max_suppression, instrumentation, state)
+        for i, k in enumerate(ks):
+            k_anon_queues[k][count] = {combination: nodes[i]
+                                       for combination, nodes in zip(combinations, k_anon_nodes)}
 
-        while comb < len(listofcomb):
+        count = count + 1
+    return
 
-            heightxcomb = list()
-            qinamesxcomb = list()
 
-            for hi in list(listofcomb[comb]):
-                qinamesxcomb.append(hi)
-                heightxcomb.append(heights[hi])
+def incognito_search(csvtable, qi_names, heights, ks, pool=None, max_suppression=None,
+                     instrumentation=None, state=None):
+    """
+    Incognito search: checks the lattices of the QI subsets of growing size, level by level,
+    each one restricted to the nodes whose subsets are all k anonymous.
 
-            G = graph.MyDiGraph()
-            G.add_vertices(heightxcomb, listofcomb[comb])
-            G.add_linked_edge(qinamesxcomb)
+    :param csvtable:            Table to anonymize.
+    :param qi_names:            List whose values are names of QI
+    :param heights:             Dictionary containing the heights of every QI, in a range format.
+    :param ks:                  List of levels of anonymity.
+    :param pool:                Worker pool checking independent QI combinations in parallel,
+                                None to check them in this process.
+    :param max_suppression:     Maximum number of suppressed rows, None for k.
+    :param instrumentation:     Instrumentation collecting the timings and counters of the
+                                search, None not to collect them.
+    :param state:               Search state keeping the frequency sets of the nodes, None not
+                                to keep them.
+
+    :return:                    Dictionary whose keys are the levels of anonymity and whose
+                                values are dictionaries containing the k anonymous combination
+                                each n-dimensions.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation()
+    k_anon_queues = {k: dict() for k in ks}
+    # The bottom nodes of all the QI subsets are projected from the one of the full QI, computed
+    # with a single pass over the rows (the worker processes do not share the cache, and with a
+    # state they are already known):
+    bottom = (0,) * len(qi_names)
+    cache = csvtable.frequency_cache
+    if pool is None and state is None and cache.max_bytes != 0 \
+            and not cache.contains(qi_names, bottom):
+        with instrumentation.phase('frequency_set'):
+            cache.put(FrequencySet.from_table(csvtable, qi_names))
+    mono_attr_verify(csvtable, qi_names, heights, ks, k_anon_queues, pool, max_suppression,
+                     instrumentation, state)
+    multi_attr_verify(csvtable, qi_names, heights, ks, k_anon_queues, pool, max_suppression,
+                      instrumentation, state)
+    return k_anon_queues
+
+
+def nodes_at_height(bottom, top, height, accept=None):
+    """
+    Generates the nodes of a lattice, between two of its nodes, with a given height.
 
-            # Search BFS bottom top
-            queue_node = G.getRoots()
+    :param bottom:              Generalization levels of the lowest node.
+    :param top:                 Generalization levels of the highest node, a generalization of
+                                the lowest one.
+    :param height:              Height of the nodes, the sum of their levels.
+    :param accept:              Function called with the levels of the first QI of a node,
+                                returning False to skip all the nodes starting with them, None
+                                to generate all the nodes.
 
-            while True:
+    :return:                    Iterator over the nodes, in lexicographic order.
+    """
+    # Lowest and highest sums of the levels after every position:
+    low = list(itertools.accumulate(reversed(bottom[1:] + (0,))))[::-1]
+    high = list(itertools.accumulate(reversed(top[1:] + (0,))))[::-1]
 
-                current = str(queue_node.pop(0))
+    def generate(i, remaining, node):
+        if i == len(bottom):
+            yield node
+            return
+        for level in range(max(bottom[i], remaining - high[i]),
+                           min(top[i], remaining - low[i]) + 1):
+            prefix = node + (level,)
+            if accept is not None and i + 1 < len(bottom) and not accept(prefix):
+                continue
+            yield from generate(i + 1, remaining - level, prefix)
 
-                # Check anonymity
+    if len(bottom) == 0:
+        return iter([()] if height == 0 else [])
+    return generate(0, height, ())
 
-                # k_anon_queue configuration:
-                # [1: ('sex:2')
-                # 2: ('sex:2;age:4')
-                # 3: (('sex:2;age:4;zipcode:1'),.....)
-                # .
-                # .
-                # .]
 
-                comb_current = current.split(";")
-                list_comb_to_check = list(itertools.combinations(comb_current, count - 1))
-                list_comb_to_check = parsing.parse_multi(list_comb_to_check)
+def tag_verify(csvtable, qi_names, G, frequencies, node, k, max_suppression, stats,
+               predict=True):
+    """
+    Checks whether a node is k anonymous, unless it has been predicted. A k anonymous node tags
+    all its generalizations as k anonymous, a node which is not tags all its specializations as
+    not k anonymous. Only the nodes visited are flagged, so the cost does not depend on the size
+    of the lattice. The predictions rely on the generalization property, so they are only valid
+    in the lattices checked by nested_lattice.
+
+    :param csvtable:            Table to anonymize.
+    :param qi_names:            List whose values are names of QI, ordered as the node levels.
+    :param G:                   Generalization graph of the QI, holding the tags.
+    :param frequencies:         Dictionary of the frequency sets of the nodes already computed,
+                                as in node_frequency.
+    :param node:                Generalization levels of the node.
+    :param k:                   Level of anonymity.
+    :param max_suppression:     Maximum number of suppressed rows, None for k.
+    :param stats:               Dictionary whose 'nodes_evaluated' and 'nodes_tagged' values are
+                                incremented by the nodes checked and predicted.
+    :param predict:             If False, the nodes are not tagged, only the result of the nodes
+                                already checked is kept. The cost of a prediction grows with the
+                                number of nodes checked.
+
+    :return:                    True if the node is k anonymous.
+    """
+    if G.isMarked(node) or predict and G.isTaggedMarked(node):
+        stats['nodes_tagged'] = stats.get('nodes_tagged', 0) + 1
+        return True
+    if G.isRejected(node) or predict and G.isTaggedRejected(node):
+        stats['nodes_tagged'] = stats.get('nodes_tagged', 0) + 1
+        return False
+
+    stats['nodes_evaluated'] = stats.get('nodes_evaluated', 0) + 1
+    k_anon = is_k_anon(node_frequency(csvtable, qi_names, frequencies, node).counts, k,
+                       max_suppression)
+    if not predict:
+        G.setMarked(node) if k_anon else G.setRejected(node)
+    elif k_anon:
+        G.tagMarked(node)
+    else:
+        G.tagRejected(node)
+    return k_anon
+
+
+def nested_lattice(csvtable, qi_names, heights):
+    """
+    Checks whether the generalization property holds in the full lattice of the QI: every level
+    of a hierarchy determines the levels above it for the values of the table, so that the
+    equivalence classes of a node are unions of the ones of its specializations. It does not
+    hold when a generalized value has several parents, like '40-60' under '0-50' and '50-100'.
 
-                is_k = True
+    :param csvtable:            Table to anonymize.
+    :param qi_names:            List whose values are names of QI
+    :param heights:             Dictionary containing the heights of every QI, in a range format.
 
-                for c in list_comb_to_check:
-                    if c not in k_anon_queue[count - 1]:
-                        is_k = False
-                if is_k:
-                    if k_anon_queue.get(count):
-                        # "None" is counted as "False"
-                        k_anon_queue[count].append(current)
-                    else:
-                        k_anon_queue[count] = [current]
+    :return:                    True if the generalizations of a k anonymous node are all k
+                                anonymous, and the specializations of a node which is not k
+                                anonymous are not.
+    """
+    # The levels being determined step by step, they are determined by any lower level too:
+    return all(csvtable.gen_nested[qi][level, level + 1]
+               for qi in qi_names for level in heights[qi][:-1])
 
-                # break the loop
-                if not G.getChildren(current):
-                    break
 
-                for n in G.getChildren(current):
-                    if n in queue_node:
-                        continue
-                    queue_node.append(n)
-            comb = comb + 1
+def _tagged_search(find, csvtable, qi_names, heights, ks, max_suppression, instrumentation,
+                   state, predict=True):
+    """
+    Runs a search of the minimal k anonymous nodes of the full lattice of the QI, for every
+    level of anonymity, sharing the frequency sets of the nodes between them.
+
+    :param find:                Function finding the minimal nodes of a lattice, called with a
+                                function checking a node, a function checking the levels of the
+                                first QI of a node as in nodes_at_height, the lowest node and the
+                                highest node.
+    :param csvtable:            Table to anonymize.
+    :param qi_names:            List whose values are names of QI
+    :param heights:             Dictionary containing the heights of every QI, in a range format.
+    :param ks:                  List of levels of anonymity.
+    :param max_suppression:     Maximum number of suppressed rows, None for k.
+    :param instrumentation:     Instrumentation collecting the timings and counters of the
+                                search, None not to collect them.
+    :param state:               Search state keeping the frequency sets of the nodes, None not
+                                to keep them.
+    :param predict:             If False, the nodes are not tagged, as in tag_verify.
+
+    :return:                    Dictionary as returned by incognito_search, with the minimal k
+                                anonymous nodes of the full QI combination only.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation()
+    combination = tuple(qi_names)
+    frequencies = dict() if state is None else state.frequencies.setdefault(combination, dict())
+    qi_height = [heights[qi] for qi in qi_names]
+    bottom = tuple(0 for _ in qi_names)
+    top = tuple(len(levels) - 1 for levels in qi_height)
+
+    # Frequency sets of the nodes of the subsets of the first QI:
+    prefix_frequencies = [dict() for _ in qi_names]
+
+    k_anon_queues = dict()
+    stats = dict()
+    with instrumentation.phase('lattice_search', len(qi_names)):
+        for k in ks:
+            # Only the visited nodes are tagged, the lattice can be too large to be stored:
+            G = graph.Lattice(qi_height)
+            prefixes = dict()
+
+            def verify(node):
+                return tag_verify(csvtable, qi_names, G, frequencies, node, k, max_suppression,
+                                  stats, predict)
+
+            def accept(prefix):
+                # A node cannot be k anonymous if its projection on the first QI is not, so the
+                # nodes of a height are generated skipping the prefixes which are not:
+                if prefix not in prefixes:
+                    size = len(prefix)
+                    frequency = node_frequency(csvtable, qi_names[:size],
+                                               prefix_frequencies[size - 1], prefix)
+                    prefixes[prefix] = is_k_anon(frequency.counts, k, max_suppression)
+                    if not prefixes[prefix]:
+                        stats['prefixes_pruned'] = stats.get('prefixes_pruned', 0) + 1
+                return prefixes[prefix]
+
+            nodes = find(verify, accept, bottom, top)
+            k_anon_queues[k] = {len(qi_names): {combination: {
+                node: node_frequency(csvtable, qi_names, frequencies, node).counts
+                for node in nodes}}}
+
+    stats['frequency_sets'] = len(frequencies)
+    for name, value in stats.items():
+        instrumentation.count(name, value, len(qi_names))
+    return k_anon_queues
+
+
+def _samarati_find(verify, accept, bottom, top):
+    """
+    Samarati binary search on the height of the lattice: the lowest height with a k anonymous
+    node is found checking the nodes of log(height) heights only.
 
-        count = count + 1
-    return
+    :return:                    List of the k anonymous nodes of the lowest height, which are
+                                all minimal.
+    """
+    if not verify(top):
+        return []
+    low, high = sum(bottom), sum(top)
+    while low < high:
+        middle = (low + high) // 2
+        if any(verify(node) for node in nodes_at_height(bottom, top, middle, accept)):
+            high = middle
+        else:
+            low = middle + 1
+    return [node for node in nodes_at_height(bottom, top, low, accept) if verify(node)]
 
 
-def generalize(qi_names, dghs, og_frequency, *data):
+def _samarati_scan(verify, accept, bottom, top):
     """
-    Anonimyze monodimensional graph and eventually n-dimensional ones.
+    Samarati search without the generalization property: a height may have no k anonymous node
+    even if a lower one has, so the heights are checked from the bottom instead of binary
+    searched.
 
-    :param qi_names:            List whose values are names of QI
-    :param og_frequency:        Frequency of equal lines in the original table.
-    :param dghs:                Dictionary whose values are paths to DGH files and whose keys
-                                are the corresponding attribute names.
-    :param data:                Contains the generalization levels
-
-    :return qi_frequency:       Contains the generalized og_frequency
-
-    """
-
-    if all(n == 0 for n in data):
-        return copy.copy(og_frequency)
-
-    qi_frequency = copy.copy(og_frequency)  # shallow copy
-
-    # Look up table for the generalized values, to avoid searching in hierarchies:
-    generalizations = dict()
-    # Generalized value to apply for the needed labels
-    generalized_value = dict()
-    # Note: using the list of keys since the dictionary is changed in size at runtime
-    # and it can't be used as an iterator:
-    for j, qi_sequence in enumerate(list(qi_frequency)):
-        if j == 0: continue
-        # Get the generalized value:
-        for i in range(len(data)):
-            # If QI is going back to genLv 0 then do nothing since it has already been "rolled back" with resetState
-            # If old and new level are the same then do nothing once again
-            if data[i] != 0:
-                if qi_sequence[i] in generalizations:
-                    # Find directly the generalized value in the look up table:
-                    generalized_value[i] = generalizations[i]
+    :return:                    List of the k anonymous nodes of the lowest height, which are
+                                all minimal.
+    """
+    for height in range(sum(bottom), sum(top) + 1):
+        nodes = [node for node in nodes_at_height(bottom, top, height, accept) if verify(node)]
+        if nodes:
+            return nodes
+    return []
+
+
+def _ola_find(verify, accept, bottom, top):
+    """
+    OLA search: binary searches on the height of sub-lattices, whose bounds are tagged nodes,
+    the result of every check being predicted for all the generalizations or specializations
+    of the node.
+
+    :return:                    List of the minimal k anonymous nodes.
+    """
+    found = set()
+    visited = set()
+
+    def k_min(low, high):
+        if (low, high) in visited:
+            return
+        visited.add((low, high))
+
+        height = sum(high) - sum(low)
+        if height > 1:
+            # The nodes which are not k anonymous are needed as bounds, none is skipped:
+            for node in nodes_at_height(low, high, sum(low) + height // 2):
+                if verify(node):
+                    k_min(low, node)
                 else:
-                    # Get the corresponding generalized value from the attribute DGH:
-                    try:
-                        generalized_value[i] = dghs[qi_names[i]] \
-                            .generalize_jump(
-                            qi_sequence[i], 0,
-                            data[i])
-                    except KeyError as error:
-                        return
-                    if generalized_value[i] is None:
-                        # Skip if it's a hierarchy root:
-                        continue
+                    k_min(node, high)
+        elif verify(low):
+            found.add(low)
+        elif verify(high):
+            found.add(high)
 
-                # Add to the look-up table:
-                generalizations[i] = generalized_value[i]
-
-        # Skip if header of Table
-        if qi_sequence is None: continue
-
-        # Tuple with generalized value:
-        new_qi_sequence = list(qi_sequence)
-        # Change only the attributes that need to be changed -> the ones with a generalization level different from before
-        for id, gen_val in generalized_value.items():
-            new_qi_sequence[id] = gen_val
-        new_qi_sequence = tuple(new_qi_sequence)
-
-        # If start of cycle no need to change or apply anything
-        # Check if there is already a tuple like this one:
-        if new_qi_sequence in qi_frequency:
-            # Update the already existing one:
-            # Update the number of occurrences:
-            occurrences = qi_frequency[new_qi_sequence][0] \
-                          + qi_frequency[qi_sequence][0]
-            # Unite the row indices sets:
-            rows_set = qi_frequency[new_qi_sequence][1] \
-                .union(qi_frequency[qi_sequence][1])
-            qi_frequency[new_qi_sequence] = (occurrences, rows_set)
-            # Remove the old sequence:
-            qi_frequency.pop(qi_sequence)
-        else:
-            # Add new tuple and remove the old one:
-            qi_frequency[new_qi_sequence] = qi_frequency.pop(qi_sequence)
+    k_min(bottom, top)
 
-    return qi_frequency
+    # Only keep the nodes which are not a generalization of another one:
+    return [node for node in found
+            if not any(other != node and all(o <= n for o, n in zip(other, node))
+                       for other in found)]
 
 
-def find_min(csvtable, k_anon_queue, qi_names, dghs):
+def samarati_search(csvtable, qi_names, heights, ks, pool=None, max_suppression=None,
+                    instrumentation=None, state=None):
     """
-    Function to create a k anonymous table given the minimum combination
+    Samarati search: binary search on the height of the full lattice of the QI. It checks
+    exponentially fewer nodes than Incognito when there are many QI, but only finds the minimal
+    nodes of the lowest k anonymous height. The nodes of a height are generated skipping the
+    ones whose first QI are not k anonymous, and are not tagged: the nodes of a height are not
+    generalizations of each other. Without the generalization property, see nested_lattice, the
+    heights are checked from the bottom instead of binary searched. The arguments are the ones of
+    incognito_search, the pool is not used.
+    """
+    find = _samarati_find if nested_lattice(csvtable, qi_names, heights) else _samarati_scan
+    return _tagged_search(find, csvtable, qi_names, heights, ks, max_suppression,
+                          instrumentation, state, predict=False)
+
+
+def ola_search(csvtable, qi_names, heights, ks, pool=None, max_suppression=None,
+               instrumentation=None, state=None):
+    """
+    OLA search: binary searches on the height of the sub-lattices of the full lattice of the
+    QI, with predictive tagging. It finds all the minimal nodes when the generalization property
+    holds, see nested_lattice, otherwise both the tags and the pruning of the sub-lattices can
+    skip minimal nodes, so the Incognito search is run instead. The arguments are the ones of
+    incognito_search, the pool is not used.
+    """
+    if not nested_lattice(csvtable, qi_names, heights):
+        return incognito_search(csvtable, qi_names, heights, ks, None, max_suppression,
+                                instrumentation, state)
+    return _tagged_search(_ola_find, csvtable, qi_names, heights, ks, max_suppression,
+                          instrumentation, state)
+
+
+STRATEGIES = {
+    'incognito': incognito_search,
+    'samarati': samarati_search,
+    'ola': ola_search,
+}
+"""
+Dictionary whose keys are the names of the lattice search strategies and whose values are the
+corresponding functions, all with the arguments of incognito_search.
+"""
+
+
+def minimal_nodes(k_anon_queue, qi_names):
+    """
+    Function to find all the minimal k anonymous combinations, the ones which are not a
+    generalization of another k anonymous combination.
 
-    :param qi_names:            List whose values are names of QI
-    :param csvtable:            Original table.
-    :param dghs:                Dictionary whose values are paths to DGH files and whose keys
-                                are the corresponding attribute names.
     :param k_anon_queue:        Dictionary containing the k anonymous combination each n-dimensions.
+    :param qi_names:            List whose values are names of QI
 
-    :return qi_frequency:       Contains the frequency of the generalized table.
+    :return:                    Dictionary whose keys are the generalization levels of the minimal
+                                combinations and whose values are the arrays of the sizes of
+                                their equivalence classes.
+    """
+    k_anon_nodes = k_anon_queue[len(qi_names)][tuple(qi_names)]
+    return {node: counts for node, counts in k_anon_nodes.items() if counts is not None}
 
+
+def find_min(csvtable, k_anon_queue, qi_names, k, metric='height'):
     """
-    qi_frequency = generate_frequency(csvtable, qi_names)
-    min = k_anon_queue[len(qi_names)][0]
-    tmp = parsing.parse_attr(min)
-    data = tuple()
+    Function to find all the minimal k anonymous combinations, ordered by information loss
+
+    :param csvtable:            Anonymized table.
+    :param k_anon_queue:        Dictionary containing the k anonymous combination each n-dimensions.
+    :param qi_names:            List whose values are names of QI
+    :param k:                   Level of anonymity.
+    :param metric:              Name of an information loss metric of the metrics module, or
+                                function with the same arguments as those metrics.
 
-    for i in tmp:
-        data = data + (int(tmp[i]),)
+    :return:                    List of the generalization levels of the minimal combinations,
+                                the one with the lowest information loss first.
+    :raises ValueError:         If no combination is k anonymous.
+    :raises KeyError:           If the metric name is not valid.
 
-    qi_frequency = generalize(qi_names, dghs, qi_frequency, *data)
+    """
+    nodes = minimal_nodes(k_anon_queue, qi_names)
+    if not nodes:
+        raise ValueError("No generalization of the table is k-anonymous.")
 
-    return qi_frequency
+    if not callable(metric):
+        metric = METRICS[metric]
+    # The metric is computed from the class sizes found during the search, on ties the lowest
+    # generalization wins, the first levels being the least generalized:
+    losses = {node: metric(csvtable, qi_names, node, counts, k)
+              for node, counts in nodes.items()}
+    return sorted(nodes, key=lambda node: (losses[node], sum(node), node))
 
 
 if __name__ == "__main__":
@@ -601,37 +1809,121 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Python implementation of the Datafly algorithm. Finds a k-anonymous "
                     "representation of a table.")
-    parser.add_argument("--private_table", "-pt", required=True,
-                        type=str, help="Path to the CSV table to K-anonymize.")
+    parser.add_argument("--private_table", "-pt", default=None,
+                        type=str, help="Path to the CSV table to K-anonymize (not needed with "
+                                       "--append).")
     parser.add_argument("--quasi_identifier", "-qi", required=True,
                         type=str, help="Names of the attributes which are Quasi Identifiers.",
                         nargs='+')
-    parser.add_argument("--domain_gen_hierarchies", "-dgh", required=True,
+    parser.add_argument("--domain_gen_hierarchies", "-dgh", default=None,
                         type=str, help="Paths to the generalization files (must have same order as "
-                                       "the QI name list.",
+                                       "the QI name list, not needed with --append).",
                         nargs='+')
     parser.add_argument("-k", required=True,
-                        type=int, help="Value of K.")
+                        type=int, help="Values of K.",
+                        nargs='+')
     parser.add_argument("--output", "-o", required=True,
-                        type=str, help="Path to the output file.")
+                        type=str, help="Path to the output file. With several values of K, it "
+                                       "can contain a '{k}' placeholder, otherwise '_<k>' is "
+                                       "added before the extension.")
+    parser.add_argument("--metric", "-m", default='height', choices=sorted(METRICS),
+                        type=str, help="Information loss metric choosing among the minimal "
+                                       "k-anonymous generalizations.")
+    parser.add_argument("--max-suppression", "-s", default=None, dest='max_suppression',
+                        type=str, help="Maximum number of suppressed rows, as a number or as a "
+                                       "percentage of the rows like '5%%' (default: K).")
+    parser.add_argument("--suppress", default='drop', choices=['drop', 'star'],
+                        type=str, help="Whether the suppressed rows are left out of the output or "
+                                       "their Quasi Identifiers are replaced with '*'.")
+    parser.add_argument("--strategy", default='incognito', choices=sorted(STRATEGIES),
+                        type=str, help="Lattice search strategy: incognito checks the lattices of "
+                                       "all the QI subsets, samarati and ola search the full "
+                                       "lattice only.")
+    parser.add_argument("--profile", default=None, nargs='?', const='',
+                        type=str, help="Logs the timings and counters of every phase. If a path "
+                                       "is given, the cProfile statistics of this process are "
+                                       "also saved to it.")
+    parser.add_argument("--workers", "-w", default=1,
+                        type=int, help="Number of worker processes checking the lattices.")
+    parser.add_argument("--dgh_cache", default=None,
+                        type=str, help="Directory where the parsed DGH files are saved, to load "
+                                       "them faster in the next runs.")
+    parser.add_argument("--chunk_size", "-c", default=None,
+                        type=int, help="If given, the table is not loaded in memory but read this "
+                                       "number of rows at a time.")
+    parser.add_argument("--frequency_cache", default=FREQUENCY_CACHE_SIZE >> 20,
+                        type=int, help="Maximum size in MB of the frequency sets of the lattice "
+                                       "nodes cached between QI subsets, 0 not to cache them.")
+    parser.add_argument("--state", default=None,
+                        type=str, help="File where the table and the state of the lattice search "
+                                       "are saved, to anonymize the table again quickly when rows "
+                                       "are appended to it.")
+    parser.add_argument("--append", "-a", default=None,
+                        type=str, help="Paths to CSV tables whose rows are appended to the table "
+                                       "saved in the state file before anonymizing it again.",
+                        nargs='+')
     args = parser.parse_args()
+    if args.append is not None and args.state is None:
+        parser.error("--append needs the --state of a previous anonymization.")
+    if args.append is None and (args.private_table is None or args.domain_gen_hierarchies is None):
+        parser.error("the following arguments are required: --private_table/-pt, "
+                     "--domain_gen_hierarchies/-dgh")
+    if args.state is not None and args.chunk_size is not None:
+        parser.error("--state cannot be used with --chunk_size.")
 
     try:
 
         start = datetime.now()
+        profiler = None
+        if args.profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
 
-        dgh_paths = dict()
-        for i, qi_name in enumerate(args.quasi_identifier):
-            dgh_paths[qi_name] = args.domain_gen_hierarchies[i]
-        table = CsvTable(args.private_table, dgh_paths)
         try:
-            table.anonymize(args.quasi_identifier, args.k, args.output, v=True)
+            instrumentation = Instrumentation()
+            state = None
+            if args.append is not None:
+                table, state = load_state(args.state)
+                table.instrumentation = instrumentation
+                for path in args.append:
+                    with instrumentation.phase('table_append'):
+                        table.append(path)
+            else:
+                dgh_paths = dict()
+                for i, qi_name in enumerate(args.quasi_identifier):
+                    dgh_paths[qi_name] = args.domain_gen_hierarchies[i]
+                if args.chunk_size is None:
+                    table = CsvTable(args.private_table, dgh_paths, args.dgh_cache,
+                                     instrumentation)
+                else:
+                    table = ChunkedCsvTable(args.private_table, dgh_paths, args.chunk_size,
+                                            args.dgh_cache, instrumentation)
+                if args.state is not None:
+                    state = SearchState()
+            table.frequency_cache = FrequencyCache(args.frequency_cache << 20)
+            table.anonymize(args.quasi_identifier, args.k[0] if len(args.k) == 1 else args.k,
+                            args.output, v=True,
+                            workers=args.workers, metric=args.metric,
+                            max_suppression=args.max_suppression, suppress=args.suppress,
+                            state=state, strategy=args.strategy)
+            if state is not None:
+                save_state(args.state, table, state)
         except KeyError as error:
             if len(error.args) > 0:
                 _Table._log("[ERROR] Quasi Identifier '%s' is not valid." % error.args[0],
                             endl=True, enabled=True)
             else:
                 _Table._log("[ERROR] A Quasi Identifier is not valid.", endl=True, enabled=True)
+        except ValueError as error:
+            _Table._log("[ERROR] %s" % error, endl=True, enabled=True)
+
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+        if args.profile is not None:
+            _Table._log("[PROFILE] %s" % json.dumps(instrumentation.report(), indent=2),
+                        endl=True, enabled=True)
 
         end = (datetime.now() - start).total_seconds()
         _Table._log("[LOG] Done in %.2f seconds (%.3f minutes (%.2f hours))" %
@@ -0,0 +1,276 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+from datetime import datetime
+import numpy as np
+from frequency import FrequencySet
+from instrumentation import Instrumentation
+from Incognito import CsvTable, ChunkedCsvTable, OUTPUT_BUFFER_SIZE, STRATEGIES
+
+GENERATION_BATCH_SIZE = 100000
+"""
+Number of rows of a synthetic table generated and written at a time.
+"""
+SENSITIVE_VALUES = ["Cancer", "AIDS", "Autism", "Flu", "Asthma", "Diabetes"]
+"""
+Values of the sensitive attribute of the synthetic tables.
+"""
+
+
+def hierarchy_value(level, index):
+
+    """
+    Gets a value of a synthetic hierarchy.
+
+    :param level:   Generalization level of the value.
+    :param index:   Index of the value among the ones of its level.
+    :return:        The value, the index itself for the values of the table.
+    """
+
+    if level == 0:
+        return str(index)
+    return "L%d_%d" % (level, index)
+
+
+def generate_hierarchy(path, depth, fan_out):
+
+    """
+    Writes a synthetic DGH file in the format of the Database directory: every line lists a value
+    followed by its generalizations, up to a single '*' root. Every value has fan_out children.
+
+    :param path:        Path to the DGH file.
+    :param depth:       Number of generalization levels above the values of the table.
+    :param fan_out:     Number of children of every generalized value.
+    :return:            Number of distinct values of the table domain, fan_out ** depth.
+    :raises IOError:    If the file cannot be written.
+    """
+
+    domain_size = fan_out ** depth
+    try:
+        with open(path, 'w', buffering=OUTPUT_BUFFER_SIZE) as file:
+            for index in range(domain_size):
+                values = [hierarchy_value(level, index // fan_out ** level)
+                          for level in range(depth)]
+                values.append('*')
+                file.write(",".join(values) + "\n")
+    except IOError:
+        raise
+    return domain_size
+
+
+def generate_table(path, rows, qi_count, domain_size, seed=0):
+
+    """
+    Writes a synthetic private table in the format of the Database directory: an id column, the
+    QI columns, whose values are drawn uniformly from the domain of a synthetic hierarchy, and a
+    sensitive attribute column.
+
+    :param path:        Path to the table file.
+    :param rows:        Number of rows of the table.
+    :param qi_count:    Number of QI columns, named qi_0, qi_1, ...
+    :param domain_size: Number of distinct values of the QI domain.
+    :param seed:        Seed of the random generator.
+    :return:            List of the names of the QI.
+    :raises IOError:    If the file cannot be written.
+    """
+
+    qi_names = ["qi_%d" % i for i in range(qi_count)]
+    generator = np.random.default_rng(seed)
+    try:
+        with open(path, 'w', buffering=OUTPUT_BUFFER_SIZE) as file:
+            file.write(",".join(["id"] + qi_names + ["disease"]) + "\n")
+            for start in range(0, rows, GENERATION_BATCH_SIZE):
+                size = min(GENERATION_BATCH_SIZE, rows - start)
+                columns = [range(start + 1, start + size + 1)]
+                for _ in qi_names:
+                    columns.append(generator.integers(domain_size, size=size).tolist())
+                columns.append([SENSITIVE_VALUES[i] for i in
+                                generator.integers(len(SENSITIVE_VALUES), size=size).tolist()])
+                file.write("".join("%d,%s\n" % (row[0], ",".join(map(str, row[1:])))
+                                   for row in zip(*columns)))
+    except IOError:
+        raise
+    return qi_names
+
+
+def generate_dataset(directory, rows, qi_count, depth, fan_out, seed=0):
+
+    """
+    Generates a synthetic table and its hierarchy, unless they have been generated already.
+
+    :param directory:   Directory of the generated files.
+    :param rows:        Number of rows of the table.
+    :param qi_count:    Number of QI.
+    :param depth:       Number of generalization levels of the hierarchy.
+    :param fan_out:     Number of children of every generalized value.
+    :param seed:        Seed of the random generator.
+    :return:            Tuple (table path, dictionary whose keys are the QI names and whose
+                        values are the paths to their DGH files).
+    :raises IOError:    If a file cannot be written.
+    """
+
+    dgh_path = os.path.join(directory, "hierarchy_%d_%d.csv" % (depth, fan_out))
+    if not os.path.exists(dgh_path):
+        generate_hierarchy(dgh_path, depth, fan_out)
+
+    table_path = os.path.join(directory, "table_%d_%d_%d_%d_%d.csv"
+                              % (rows, qi_count, depth, fan_out, seed))
+    qi_names = ["qi_%d" % i for i in range(qi_count)]
+    if not os.path.exists(table_path):
+        generate_table(table_path, rows, qi_count, fan_out ** depth, seed)
+
+    return table_path, {qi: dgh_path for qi in qi_names}
+
+
+def run(table_path, dgh_paths, k, output, workers=1, chunk_size=None, strategy='incognito'):
+
+    """
+    Anonymizes a table with CsvTable.anonymize, collecting the timings of its phases from the
+    instrumentation of the table.
+
+    :param table_path:  Path to the table.
+    :param dgh_paths:   Dictionary whose keys are the QI names and whose values are the paths to
+                        their DGH files.
+    :param k:           Level of anonymity.
+    :param output:      Path to the output file.
+    :param workers:     Number of worker processes checking the lattices.
+    :param chunk_size:  If given, the table is read this number of rows at a time.
+    :param strategy:    Name of the lattice search strategy, one of STRATEGIES.
+    :return:            Dictionary whose keys are the names of the phases and whose values are
+                        their seconds, summed over the keys of the phases measured by key, the
+                        frequency set of all the QI always among them, together with the number of equivalence classes of the bottom node, the
+                        chosen generalization levels and the counters of the search.
+    """
+
+    qi_names = list(dgh_paths)
+    instrumentation = Instrumentation()
+
+    if chunk_size is None:
+        table = CsvTable(table_path, dgh_paths, instrumentation=instrumentation)
+    else:
+        table = ChunkedCsvTable(table_path, dgh_paths, chunk_size,
+                                instrumentation=instrumentation)
+    levels = table.anonymize(qi_names, k, output, v=False, workers=workers,
+                             strategy=strategy)[k][0]
+
+    if 'frequency_set' in instrumentation.timings:
+        classes = len(FrequencySet.from_table(table, qi_names))
+    else:
+        # Only the incognito search without workers computes the frequency set of all the QI:
+        with instrumentation.phase('frequency_set'):
+            classes = len(FrequencySet.from_table(table, qi_names))
+
+    report = instrumentation.report()
+    timings = {phase: sum(seconds.values()) if isinstance(seconds, dict) else seconds
+               for phase, seconds in report['timings'].items()}
+    return {'phases': timings, 'classes': classes, 'levels': list(levels),
+            'counters': report['counters']}
+
+
+def compare(results, baseline, tolerance):
+
+    """
+    Compares the timings of a benchmark with the ones of a previous version.
+
+    :param results:     List of the results of the benchmark.
+    :param baseline:    List of the results of the previous version.
+    :param tolerance:   Relative slowdown allowed, 0.2 for 20%.
+    :return:            List of messages describing the phases slower than allowed.
+    """
+
+    key = ('rows', 'qi', 'depth', 'fan_out', 'k')
+    previous = {tuple(result[name] for name in key): result for result in baseline}
+    regressions = list()
+    for result in results:
+        old = previous.get(tuple(result[name] for name in key))
+        if old is None:
+            continue
+        for phase, seconds in result['phases'].items():
+            old_seconds = old['phases'].get(phase)
+            if old_seconds and seconds > old_seconds * (1 + tolerance):
+                regressions.append("%s %s: %.3f s instead of %.3f s"
+                                   % (dict(zip(key, (result[name] for name in key))), phase,
+                                      seconds, old_seconds))
+    return regressions
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Times the phases of the Incognito anonymization on synthetic tables and "
+                    "hierarchies, writing the results as JSON.")
+    parser.add_argument("--rows", "-r", default=[1000, 10000, 100000],
+                        type=int, help="Numbers of rows of the tables.", nargs='+')
+    parser.add_argument("--qi", "-q", default=[3],
+                        type=int, help="Numbers of Quasi Identifiers.", nargs='+')
+    parser.add_argument("--depth", "-d", default=[3],
+                        type=int, help="Heights of the hierarchies.", nargs='+')
+    parser.add_argument("--fan_out", "-f", default=[4],
+                        type=int, help="Numbers of children of every generalized value.",
+                        nargs='+')
+    parser.add_argument("-k", default=[2],
+                        type=int, help="Values of K.", nargs='+')
+    parser.add_argument("--repeat", default=1,
+                        type=int, help="Number of runs of every configuration, the fastest one "
+                                       "is kept.")
+    parser.add_argument("--workers", "-w", default=1,
+                        type=int, help="Number of worker processes checking the lattices.")
+    parser.add_argument("--chunk_size", "-c", default=None,
+                        type=int, help="If given, the tables are read this number of rows at a "
+                                       "time.")
+    parser.add_argument("--strategy", default='incognito', choices=sorted(STRATEGIES),
+                        type=str, help="Lattice search strategy.")
+    parser.add_argument("--seed", default=0,
+                        type=int, help="Seed of the random generator of the tables.")
+    parser.add_argument("--data", default=None,
+                        type=str, help="Directory of the generated tables and hierarchies, "
+                                       "reused by the next runs (default: a temporary one).")
+    parser.add_argument("--output", "-o", required=True,
+                        type=str, help="Path to the JSON file of the results.")
+    parser.add_argument("--baseline", "-b", default=None,
+                        type=str, help="JSON file of the results of a previous version to "
+                                       "compare with.")
+    parser.add_argument("--tolerance", default=0.2,
+                        type=float, help="Relative slowdown allowed before reporting a "
+                                         "regression.")
+    args = parser.parse_args()
+
+    data = args.data if args.data is not None else tempfile.mkdtemp()
+    os.makedirs(data, exist_ok=True)
+    results = list()
+
+    for rows, qi_count, depth, fan_out in itertools.product(args.rows, args.qi, args.depth,
+                                                             args.fan_out):
+        table_path, dgh_paths = generate_dataset(data, rows, qi_count, depth, fan_out,
+                                                 args.seed)
+        for k in args.k:
+            runs = [run(table_path, dgh_paths, k, os.path.join(data, "output.csv"),
+                        args.workers, args.chunk_size, args.strategy)
+                    for _ in range(args.repeat)]
+            result = {'rows': rows, 'qi': qi_count, 'depth': depth, 'fan_out': fan_out, 'k': k,
+                      'classes': runs[0]['classes'], 'levels': runs[0]['levels'],
+                      'counters': runs[0]['counters'],
+                      'phases': {phase: min(r['phases'][phase] for r in runs)
+                                 for phase in runs[0]['phases']}}
+            results.append(result)
+            print("[LOG] rows=%d qi=%d depth=%d fan_out=%d k=%d: %s"
+                  % (rows, qi_count, depth, fan_out, k,
+                     ", ".join("%s %.3f s" % item for item in result['phases'].items())))
+
+    with open(args.output, 'w') as file:
+        json.dump({'date': datetime.now().isoformat(), 'python': platform.python_version(),
+                   'numpy': np.__version__, 'workers': args.workers,
+                   'chunk_size': args.chunk_size, 'strategy': args.strategy,
+                   'results': results}, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as file:
+            regressions = compare(results, json.load(file)['results'], args.tolerance)
+        for regression in regressions:
+            print("[REGRESSION] %s" % regression)
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,107 @@
+import argparse
+import itertools
+import os
+import sys
+import numpy as np
+from dgh import CsvDGH
+from frequency import FrequencySet
+from Incognito import MemoryTable, STRATEGIES, is_k_anon, minimal_nodes
+
+DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Database")
+"""
+Directory of the shipped DGH files.
+"""
+AGES = range(38, 63)
+"""
+Ages of the generated tables, around '40-60', which is under both '0-50' and '50-100' in the
+shipped age DGH, so that the generalization property does not always hold.
+"""
+ZIP_CODES = ["67010", "67012", "67013", "67014", "16151", "25049"]
+"""
+Zip codes of the generated tables.
+"""
+
+
+def brute_force(table, qi_names, k, max_suppression):
+
+    """
+    Finds the minimal k-anonymous nodes of the full lattice of the QI checking all of its nodes.
+
+    :param table:           Table to anonymize.
+    :param qi_names:        List of names of the QI.
+    :param k:               Level of anonymity.
+    :param max_suppression: Maximum number of suppressed rows, None for k.
+    :return:                Set of the minimal k-anonymous nodes.
+    """
+
+    bottom = FrequencySet.from_table(table, qi_names)
+    heights = [range(table.dghs[qi].get_tree_height() + 1) for qi in qi_names]
+    k_anon = [node for node in itertools.product(*heights)
+              if is_k_anon(bottom.roll_up(table, node).counts, k, max_suppression)]
+    return {node for node in k_anon
+            if not any(other != node and all(o <= n for o, n in zip(other, node))
+                       for other in k_anon)}
+
+
+def check(table, qi_names, k, max_suppression):
+
+    """
+    Compares the minimal nodes found by every search strategy with the ones of brute_force. The
+    samarati strategy only finds the ones of the lowest k-anonymous height.
+
+    :param table:           Table to anonymize.
+    :param qi_names:        List of names of the QI.
+    :param k:               Level of anonymity.
+    :param max_suppression: Maximum number of suppressed rows, None for k.
+    :return:                List of the names of the strategies which disagree.
+    """
+
+    expected = brute_force(table, qi_names, k, max_suppression)
+    lowest = min((sum(node) for node in expected), default=None)
+    heights = {qi: list(range(table.dghs[qi].get_tree_height() + 1)) for qi in qi_names}
+    wrong = list()
+    for name, search in sorted(STRATEGIES.items()):
+        found = set(minimal_nodes(search(table, qi_names, heights, [k], None,
+                                         max_suppression)[k], qi_names))
+        if name == 'samarati':
+            found_expected = {node for node in expected if sum(node) == lowest}
+        else:
+            found_expected = expected
+        if found != found_expected:
+            wrong.append(name)
+    return wrong
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description="Checks the lattice search strategies against a brute force search on "
+                    "small random tables with the shipped DGHs.")
+    parser.add_argument("--tables", "-t", default=300,
+                        type=int, help="Number of random tables.")
+    parser.add_argument("--seed", default=0,
+                        type=int, help="Seed of the random generator of the tables.")
+    args = parser.parse_args()
+
+    dghs = {qi: CsvDGH(os.path.join(DATABASE, "%s_generalization.csv" % qi))
+            for qi in ("age", "sex", "zip_code")}
+    generator = np.random.default_rng(args.seed)
+    failures = 0
+
+    for table_index in range(args.tables):
+        rows = [[str(i), str(generator.choice(AGES)), str(generator.choice(["M", "F"])),
+                 str(generator.choice(ZIP_CODES))]
+                for i in range(generator.integers(4, 13))]
+        table = MemoryTable(rows, dghs, header=["id", "age", "sex", "zip_code"])
+        qi_names = [str(qi) for qi in generator.permutation(["age", "sex", "zip_code"])]
+        k = int(generator.integers(2, 4))
+        max_suppression = int(generator.integers(0, 3))
+        wrong = check(table, qi_names, k, max_suppression)
+        if wrong:
+            failures += 1
+            print("[MISMATCH] table %d, qi %s, k=%d, max suppression %d: %s"
+                  % (table_index, ",".join(qi_names), k, max_suppression, ", ".join(wrong)))
+
+    print("[LOG] %d of %d tables disagree with the brute force search." % (failures, args.tables))
+    if failures:
+        sys.exit(1)
@@ -1,6 +1,30 @@
 import csv
-from io import StringIO
-from tree import Node, Tree
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+
+
+def _compiled_path(dgh_path, cache_dir):
+
+    """
+    Gets the path of the compiled form of a DGH file, named after the hash of the file content,
+    so that a modified file is never matched with the compiled form of its previous version.
+
+    :param dgh_path:            Path to the file which contains the DGH definition.
+    :param cache_dir:           Directory of the compiled DGHs.
+    :return:                    Path of the directory of the compiled DGH.
+    :raises FileNotFoundError:  If the file is not found.
+    :raises IOError:            If the file cannot be read.
+    """
+
+    digest = hashlib.sha1()
+    with open(dgh_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return os.path.join(cache_dir, digest.hexdigest())
 
 
 class _DGH:
@@ -8,7 +32,7 @@ class _DGH:
     def __init__(self, dgh_path):
 
         """
-        Represents multiple hierarchies as a dictionary of trees.
+        Represents multiple hierarchies as arrays of nodes.
 
         :param dgh_path:            Path to the file which contains the DGH definition.
         :raises FileNotFoundError:  If the file is not found.
@@ -17,8 +41,8 @@ class _DGH:
 
         self.hierarchies = dict()
         """
-        Dictionary where the values are trees and the keys are the values of the corresponding 
-        roots.
+        Dictionary whose keys are the hierarchies root values and whose values are the indices of
+        the corresponding root nodes.
         """
 
         self.gen_levels = dict()
@@ -27,6 +51,133 @@ class _DGH:
         depths (number of generalization levels).
         """
 
+        self._values = list()
+        """
+        List of the (interned) values of the nodes of all the hierarchies, each hierarchy in 
+        breadth first order, so that every node comes after its parent.
+        """
+
+        self._parents = np.zeros(0, dtype=np.int32)
+        """
+        Array of the indices of the parents of the nodes, -1 for roots.
+        """
+
+        self._levels = np.zeros(0, dtype=np.int32)
+        """
+        Array of the generalization levels of the nodes.
+        """
+
+        self._ancestors_table = np.zeros((0, 1), dtype=np.int32)
+        """
+        Array whose item [n, j] is the index of the ancestor of node n which is j levels above it,
+        -1 if it's above the hierarchy root.
+        """
+
+        self._index = dict()
+        """
+        Dictionary whose keys are generalization levels (None stands for any level) and whose 
+        values are dictionaries mapping each value of that level to the index of its node.
+        """
+
+    def _set_nodes(self, values, parents, levels):
+
+        """
+        Sets the nodes of the hierarchies and builds the look-up tables of their values and
+        ancestors, so that generalizations don't need to search the hierarchies.
+
+        :param values:  List of the values of the nodes, every node after its parent.
+        :param parents: Array of the indices of the parents of the nodes, -1 for roots.
+        :param levels:  Array of the generalization levels of the nodes.
+        """
+
+        self._values = [sys.intern(value) for value in values]
+        self._parents = parents
+        self._levels = levels
+
+        self._index = {None: dict()}
+        for node, (value, parent, level) in enumerate(zip(self._values, parents.tolist(),
+                                                          levels.tolist())):
+            if parent < 0:
+                self.hierarchies[value] = node
+                self.gen_levels[value] = level
+            # Keep the first match, as the searches across hierarchies did:
+            self._index.setdefault(level, dict()).setdefault(value, node)
+            self._index[None].setdefault(value, node)
+
+        # Column j holds the ancestors j levels above the nodes:
+        height = int(levels.max()) if len(levels) else 0
+        self._ancestors_table = np.full((len(values), height + 1), -1, dtype=np.int32)
+        self._ancestors_table[:, 0] = np.arange(len(values))
+        for jumps in range(1, height + 1):
+            previous = self._ancestors_table[:, jumps - 1]
+            has_parent = previous >= 0
+            self._ancestors_table[has_parent, jumps] = parents[previous[has_parent]]
+
+    def _load_compiled(self, path):
+
+        """
+        Loads the hierarchies from their compiled form, if it has been saved. It skips the
+        parsing of the DGH file, the look-up tables are built again.
+
+        :param path:    Path of the directory of the compiled DGH, as given by _compiled_path.
+        :return:        True if the hierarchies have been loaded, False otherwise.
+        """
+
+        try:
+            values, parents, levels = (np.load(os.path.join(path, name + '.npy'))
+                                       for name in ('values', 'parents', 'levels'))
+        except (OSError, ValueError):
+            return False
+
+        self._set_nodes(values.tolist(), parents, levels)
+        return True
+
+    def _save_compiled(self, path, values, parents, levels):
+
+        """
+        Saves the compiled form of the hierarchies, as .npy arrays. Failures are ignored, since
+        the DGH file can always be parsed again.
+
+        :param path:        Path of the directory of the compiled DGH, as given by _compiled_path.
+        :param values:      List of the values of the nodes, every node after its parent.
+        :param parents:     Array of the indices of the parents of the nodes, -1 for roots.
+        :param levels:      Array of the generalization levels of the nodes.
+        """
+
+        cache_dir = os.path.dirname(path)
+        new_path = None
+
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # Write a new directory and move it in place, so that readers never see it partial:
+            new_path = tempfile.mkdtemp(dir=cache_dir)
+            np.save(os.path.join(new_path, 'values.npy'), np.array(values, dtype=str))
+            np.save(os.path.join(new_path, 'parents.npy'), parents)
+            np.save(os.path.join(new_path, 'levels.npy'), levels)
+            # A concurrent run may have saved the same content already:
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(new_path, path)
+        except OSError:
+            if new_path is not None:
+                shutil.rmtree(new_path, ignore_errors=True)
+
+    def _node(self, value, gen_level=None):
+
+        """
+        Returns the node of a value.
+
+        :param value:       Value to find.
+        :param gen_level:   Level of generalization of the value, None to search across all levels.
+        :return:            Index of the node.
+        :raises KeyError:   If the value is not part of the domain.
+        """
+
+        node = self._index.get(gen_level, dict()).get(value)
+        if node is None:
+            raise KeyError(value)
+
+        return node
+
     def generalize(self, value, gen_level=None):
 
         """
@@ -38,27 +189,13 @@ class _DGH:
         :raises KeyError:   If the value is not part of the domain.
         """
 
-        # Search across all hierarchies (slow if there are a lot of hierarchies):
-        for hierarchy in self.hierarchies:
-
-            # Try to find the node:
-            if gen_level is None:
-                node = self.hierarchies[hierarchy].bfs_search(value)
-            else:
-                node = self.hierarchies[hierarchy].bfs_search(
-                    value,
-                    self.gen_levels[hierarchy] - gen_level)     # Depth.
+        parent = self._parents[self._node(value, gen_level)]
 
-            if node is None:
-                continue
-            elif node.parent is None:
-                # The value is a hierarchy root:
-                return None
-            else:
-                return node.parent.data
-
-        # The value is not found:
-        raise KeyError(value)
+        if parent < 0:
+            # The value is a hierarchy root:
+            return None
+        else:
+            return self._values[parent]
 
     def generalize_jump(self, value, gen_level, jumps):
 
@@ -72,61 +209,15 @@ class _DGH:
         :raises KeyError:   If the value is not part of the domain.
         """
 
-        # Search across all hierarchies (slow if there are a lot of hierarchies):
-        for hierarchy in self.hierarchies:
-
-            # Try to find the node:
-            if gen_level is None:
-                node = self.hierarchies[hierarchy].bfs_search(value)
-            else:
-                node = self.hierarchies[hierarchy].bfs_search(
-                    value,
-                    self.gen_levels[hierarchy] - gen_level)     # Depth.
-
-            if node is None:
-                continue
-            elif node.parent is None:
-                # The value is a hierarchy root:
-                return None
-            else:
-                current = node
-                for i in range(jumps):
-                    if current.parent is None: return None # return error
-                    current = current.parent
-                return current.data
-
-        # The value is not found:
-        raise KeyError(value)
-
-
-class CsvDGH(_DGH):
-
-    def __init__(self, dgh_path):
-
-        super().__init__(dgh_path)
-
-        try:
-            with open(dgh_path, 'r') as file:
-                for line in file:
-
-                    try:
-                        csv_reader = csv.reader(StringIO(line))
-                    except IOError:
-                        raise
-                    values = next(csv_reader)
+        node = self._node(value, gen_level)
 
-                    # If it doesn't exist a hierarchy with this root, add one:
-                    if values[-1] not in self.hierarchies:
-                        self.hierarchies[values[-1]] = Tree(Node(values[-1]))
-                        # Add the number of generalization levels:
-                        self.gen_levels[values[-1]] = len(values) - 1
-                    # Populate hierarchy with the other values:
-                    self._insert_hierarchy(values[:-1], self.hierarchies[values[-1]])
+        if self._parents[node] < 0 or jumps >= self._ancestors_table.shape[1] \
+                or self._ancestors_table[node, jumps] < 0:
+            # The value is a hierarchy root, or the jumps go beyond it:
+            return None
+        else:
+            return self._values[self._ancestors_table[node, jumps]]
 
-        except FileNotFoundError:
-            raise
-        except IOError:
-            raise
 
     def get_tree_height(self):
         """
@@ -142,29 +233,121 @@ class CsvDGH(_DGH):
         return self.gen_levels[tmp]
 
 
-    @staticmethod
-    def _insert_hierarchy(values, tree):
+    def encode_levels(self, values):
+
+        """
+        Encodes values of the domain as integer codes at every generalization level, so that
+        generalizing them is a matter of indexing an array.
+
+        :param values:      List of distinct values to encode, whose codes at level 0 are their
+                            indices in the list.
+        :return:            Couple (codes, labels) where codes is an array of shape
+                            (height + 1, len(values)) whose row l holds the codes of the values
+                            generalized to level l, and labels is a list whose item l is the list of
+                            level l values indexed by their codes.
+        :raises KeyError:   If a value is not part of the domain.
+        """
+
+        height = self.get_tree_height()
+        codes = np.empty((height + 1, len(values)), dtype=np.int32)
+        labels = list()
+
+        nodes = np.array([self._node(value, 0) for value in values], dtype=np.int32)
+        generalized_nodes = nodes
+
+        for level in range(height + 1):
+            if level < self._ancestors_table.shape[1]:
+                ancestors = self._ancestors_table[nodes, level]
+                # Values whose hierarchy is shorter stay on their root:
+                generalized_nodes = np.where(ancestors >= 0, ancestors, generalized_nodes)
+            level_codes = dict()
+            for i, node in enumerate(generalized_nodes.tolist()):
+                codes[level, i] = level_codes.setdefault(self._values[node], len(level_codes))
+            labels.append(list(level_codes))
+
+        return codes, labels
+
+
+class CsvDGH(_DGH):
+
+    def __init__(self, dgh_path, cache_dir=None):
+
+        """
+        Reads multiple hierarchies from a CSV file, where every line lists a value followed by
+        its generalizations.
 
+        :param dgh_path:            Path to the file which contains the DGH definition.
+        :param cache_dir:           Directory where the compiled DGHs are saved and loaded from,
+                                    None to always parse the file.
+        :raises FileNotFoundError:  If the file is not found.
+        :raises IOError:            If the file cannot be read.
         """
-        Inserts values, ordered from child to parent, to a tree.
 
-        :param values:  List of values to insert.
-        :param tree:    Tree where to insert the values.
-        :return:        True if the hierarchy has been inserted, False otherwise.
+        super().__init__(dgh_path)
+
+        compiled_path = None
+        if cache_dir is not None:
+            compiled_path = _compiled_path(dgh_path, cache_dir)
+            if self._load_compiled(compiled_path):
+                return
+
+        values, parents, levels = list(), list(), list()
+        children = dict()
         """
+        Dictionary whose keys are couples (parent index, child value) and whose values are the
+        indices of the child nodes.
+        """
+
+        try:
+            with open(dgh_path, 'r') as file:
+                for row in csv.reader(file):
 
-        current_node = tree.root
+                    # Ignore empty lines:
+                    if not row:
+                        continue
 
-        for i, value in enumerate(reversed(values)):
+                    # If it doesn't exist a hierarchy with this root, add one:
+                    node = children.get((-1, row[-1]))
+                    if node is None:
+                        node = children[(-1, row[-1])] = len(values)
+                        # The root level is the number of generalization levels:
+                        values.append(row[-1])
+                        parents.append(-1)
+                        levels.append(len(row) - 1)
+
+                    # Populate hierarchy with the other values, from parent to child:
+                    for i in range(len(row) - 2, -1, -1):
+                        parent = node
+                        node = children.get((parent, row[i]))
+                        if node is None:
+                            node = children[(parent, row[i])] = len(values)
+                            values.append(row[i])
+                            parents.append(parent)
+                            levels.append(levels[parent] - 1)
 
-            if value in current_node.children:
-                current_node = current_node.children[value]
-                continue
-            else:
-                # Insert the hierarchy from this node:
-                for v in list(reversed(values))[i:]:
-                    current_node.add_child(Node(v))
-                    current_node = current_node.children[v]
-                return True
+        except FileNotFoundError:
+            raise
+        except IOError:
+            raise
 
-        return False
+        # Sort the nodes breadth first, each hierarchy after the other:
+        parents = np.array(parents, dtype=np.int32)
+        levels = np.array(levels, dtype=np.int32)
+        roots = np.flatnonzero(parents < 0)
+        root_of = np.arange(len(values), dtype=np.int32)
+        for _ in range(int(levels.max()) if len(levels) else 0):
+            has_parent = parents[root_of] >= 0
+            root_of[has_parent] = parents[root_of[has_parent]]
+        hierarchy = np.empty(len(values), dtype=np.int32)
+        hierarchy[roots] = np.arange(len(roots))
+        order = np.lexsort((np.arange(len(values)), -levels, hierarchy[root_of]))
+
+        position = np.empty(len(values), dtype=np.int32)
+        position[order] = np.arange(len(values), dtype=np.int32)
+        parents = parents[order]
+        parents[parents >= 0] = position[parents[parents >= 0]]
+        nodes = ([values[node] for node in order.tolist()], parents, levels[order])
+
+        self._set_nodes(*nodes)
+        if compiled_path is not None:
+            self._save_compiled(compiled_path, *nodes)
@@ -0,0 +1,367 @@
+from collections import OrderedDict
+import numpy as np
+
+
+def combine_codes(codes, cardinalities):
+    """
+    Encodes sequences of codes as single integer keys, equal sequences getting equal keys.
+
+    :param codes:           List of arrays of codes, one per QI.
+    :param cardinalities:   List of the number of distinct codes of every QI.
+    :return:                Array of the keys of the sequences.
+    """
+
+    keys = np.zeros(len(codes[0]), dtype=np.int64)
+    capacity = 1
+    for qi_codes, cardinality in zip(codes, cardinalities):
+        if capacity * cardinality >= 2 ** 62:
+            # Compact the keys before they can overflow:
+            unique_keys, keys = np.unique(keys, return_inverse=True)
+            capacity = len(unique_keys)
+        keys = keys * cardinality + qi_codes
+        capacity *= cardinality
+    return keys
+
+
+class FrequencySet:
+
+    def __init__(self, qi_names, levels, codes, counts):
+
+        """
+        Represents the equivalence classes of a table generalized to a lattice node.
+
+        :param qi_names:    Names of the QI.
+        :param levels:      Generalization levels of the QI.
+        :param codes:       List of arrays, one per QI, with the not generalized codes of a
+                            representative row of every class.
+        :param counts:      Array of the sizes of the classes.
+        """
+
+        self.qi_names = tuple(qi_names)
+        self.levels = tuple(levels)
+        self.codes = codes
+        """
+        List of arrays, one per QI, with the not generalized codes of a representative row of
+        every class. Any row can stand for its class as long as the class is only rolled up to
+        levels its values determine.
+        """
+        self.counts = counts
+        """
+        Array of the sizes of the classes.
+        """
+
+    def __len__(self):
+
+        return len(self.counts)
+
+    @classmethod
+    def from_table(cls, csvtable, qi_names, rows=slice(None)):
+
+        """
+        Groups the rows of a table into the equivalence classes of the not generalized QI.
+
+        :param csvtable:    Table to group.
+        :param qi_names:    Names of the QI.
+        :param rows:        Slice of the rows of the columns to group, all of them by default.
+        :return:            The frequency set of the bottom node of the lattice.
+        :raises KeyError:   If a QI name is not valid.
+        """
+
+        columns = [csvtable.columns[qi][rows] for qi in qi_names]
+        cardinalities = [len(csvtable.values[qi]) for qi in qi_names]
+        keys = combine_codes(columns, cardinalities)
+
+        if csvtable.weights is None:
+            _, first_rows, counts = np.unique(keys, return_index=True, return_counts=True)
+        else:
+            # Every row of the columns stands for a number of rows of the table:
+            _, first_rows, classes = np.unique(keys, return_index=True, return_inverse=True)
+            counts = np.bincount(classes.ravel(),
+                                 weights=csvtable.weights[rows]).astype(np.int64)
+
+        return cls(qi_names, (0,) * len(qi_names),
+                   [column[first_rows] for column in columns], counts)
+
+    def can_roll_up(self, csvtable, levels):
+
+        """
+        Checks whether the frequency set of a node can be computed from this one.
+
+        :param csvtable:    Table whose generalization codes are used.
+        :param levels:      Generalization levels of the node.
+        :return:            True if every class of this set is part of a single class of the node.
+        """
+
+        return all(current <= level and csvtable.gen_nested[qi][current, level]
+                   for qi, current, level in zip(self.qi_names, self.levels, levels))
+
+    def roll_up(self, csvtable, levels):
+
+        """
+        Computes the frequency set of a more generalized node, merging the classes of this one.
+        The cost depends on the number of classes, not on the number of rows.
+
+        :param csvtable:    Table whose generalization codes are used.
+        :param levels:      Generalization levels of the node.
+        :return:            The frequency set of the node.
+        :raises ValueError: If the classes of this set cannot be rolled up to the node.
+        """
+
+        levels = tuple(levels)
+        if not self.can_roll_up(csvtable, levels):
+            raise ValueError(levels)
+        if levels == self.levels:
+            return self
+        return self._group(csvtable, levels)
+
+    @property
+    def nbytes(self):
+
+        """
+        Size in bytes of the arrays of this set.
+        """
+
+        return sum(qi_codes.nbytes for qi_codes in self.codes) + self.counts.nbytes
+
+    def can_project(self, csvtable, qi_names, levels):
+
+        """
+        Checks whether the frequency set of a node of some of the QI of this set can be computed
+        from this one.
+
+        :param csvtable:    Table whose generalization codes are used.
+        :param qi_names:    Names of the QI of the node, all of them QI of this set.
+        :param levels:      Generalization levels of the node.
+        :return:            True if every class of this set is part of a single class of the node.
+        """
+
+        current = dict(zip(self.qi_names, self.levels))
+        return all(qi in current and current[qi] <= level
+                   and csvtable.gen_nested[qi][current[qi], level]
+                   for qi, level in zip(qi_names, levels))
+
+    def project(self, csvtable, qi_names, levels):
+
+        """
+        Computes the frequency set of a node of some of the QI of this set, at the same or more
+        generalized levels, merging the classes of this one which only differ on the other QI.
+        The cost depends on the number of classes, not on the number of rows.
+
+        :param csvtable:    Table whose generalization codes are used.
+        :param qi_names:    Names of the QI of the node.
+        :param levels:      Generalization levels of the node.
+        :return:            The frequency set of the node.
+        :raises ValueError: If the classes of this set cannot be projected on the node.
+        """
+
+        qi_names = tuple(qi_names)
+        levels = tuple(levels)
+        if not self.can_project(csvtable, qi_names, levels):
+            raise ValueError(levels)
+        if qi_names == self.qi_names:
+            return self.roll_up(csvtable, levels)
+
+        indices = [self.qi_names.index(qi) for qi in qi_names]
+        projected = FrequencySet(qi_names, [self.levels[i] for i in indices],
+                                 [self.codes[i] for i in indices], self.counts)
+        return projected._group(csvtable, levels)
+
+    def merge(self, csvtable, other):
+
+        """
+        Adds the classes of another frequency set of the same node, like the one of rows
+        appended to the table. The cost depends on the number of classes of the two sets.
+
+        :param csvtable:    Table whose generalization codes are used.
+        :param other:       Frequency set to add, with the same QI and levels.
+        :return:            The frequency set of the rows of both sets.
+        :raises ValueError: If the sets are not of the same node.
+        """
+
+        if other.qi_names != self.qi_names or other.levels != self.levels:
+            raise ValueError(other.levels)
+
+        merged = FrequencySet(self.qi_names, self.levels,
+                              [np.concatenate((qi_codes, other_codes))
+                               for qi_codes, other_codes in zip(self.codes, other.codes)],
+                              np.concatenate((self.counts, other.counts)))
+        return merged._group(csvtable, self.levels)
+
+    def _group(self, csvtable, levels):
+
+        """
+        Merges the classes of this set which are equal at some generalization levels.
+
+        :param csvtable:    Table whose generalization codes are used.
+        :param levels:      Generalization levels of the node.
+        :return:            The frequency set of the node.
+        """
+
+        codes = list()
+        cardinalities = list()
+        for qi, level, qi_codes in zip(self.qi_names, levels, self.codes):
+            codes.append(csvtable.gen_codes[qi][level][qi_codes])
+            cardinalities.append(len(csvtable.gen_values[qi][level]))
+
+        _, first_classes, classes = np.unique(combine_codes(codes, cardinalities),
+                                              return_index=True, return_inverse=True)
+        counts = np.bincount(classes.ravel(), weights=self.counts).astype(np.int64)
+
+        return FrequencySet(self.qi_names, levels,
+                            [qi_codes[first_classes] for qi_codes in self.codes], counts)
+
+
+class FrequencyCache:
+
+    def __init__(self, max_bytes=None):
+
+        """
+        Bounded cache of the frequency sets of the lattice nodes of any QI combination, evicting
+        the least recently used ones. A node which is not cached can still be computed from the
+        cached bottom node of its QI, or of a combination of more QI, rolling it up and
+        projecting it on its QI, without any pass over the rows of the table.
+
+        :param max_bytes:   Maximum size in bytes of the arrays of the cached frequency sets,
+                            None for no limit.
+        """
+
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        """
+        Size in bytes of the arrays of the cached frequency sets.
+        """
+        self.hits = 0
+        """
+        Number of lookups of a cached node.
+        """
+        self.projections = 0
+        """
+        Number of lookups of a node computed from a cached bottom node.
+        """
+        self.misses = 0
+        """
+        Number of lookups of a node which cannot be computed from the cached ones.
+        """
+        self.evictions = 0
+        """
+        Number of frequency sets evicted to stay within the maximum size.
+        """
+        self._entries = OrderedDict()
+        """
+        Ordered dictionary whose keys are couples (QI names, levels) and whose values are the
+        frequency sets, the least recently used first.
+        """
+        self._bottoms = dict()
+        """
+        Dictionary whose keys are the sets of the QI names of the cached bottom nodes and whose
+        values are the keys of their entries, so that a lookup only goes through the bottom
+        nodes instead of all the entries.
+        """
+
+    def __len__(self):
+
+        return len(self._entries)
+
+    def contains(self, qi_names, levels):
+
+        """
+        Checks whether the frequency set of a node is cached, without using it.
+
+        :param qi_names:    Names of the QI of the node.
+        :param levels:      Generalization levels of the node.
+        :return:            True if the frequency set is cached.
+        """
+
+        return (tuple(qi_names), tuple(levels)) in self._entries
+
+    def get(self, csvtable, qi_names, levels):
+
+        """
+        Gets the frequency set of a node, from the cache or rolled up from the bottom node of its
+        QI. If that one is not cached either, it is projected from the cached bottom node with
+        the fewest classes of a combination of more QI. The computed sets are cached.
+
+        :param csvtable:    Table whose generalization codes are used.
+        :param qi_names:    Names of the QI of the node.
+        :param levels:      Generalization levels of the node.
+        :return:            The frequency set of the node, None if it cannot be computed from
+                            the cached ones.
+        """
+
+        key = (tuple(qi_names), tuple(levels))
+        frequency = self._entries.get(key)
+        if frequency is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return frequency
+
+        bottom_key = (key[0], (0,) * len(key[0]))
+        bottom = self._entries.get(bottom_key)
+        if bottom is None:
+            qi_set = frozenset(key[0])
+            for combination, source_key in self._bottoms.items():
+                source = self._entries[source_key]
+                if qi_set <= combination and (bottom is None or len(source) < len(bottom)):
+                    bottom = source
+            if bottom is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((bottom.qi_names, bottom.levels))
+            bottom = bottom.project(csvtable, bottom_key[0], bottom_key[1])
+            self.put(bottom)
+        else:
+            self._entries.move_to_end(bottom_key)
+
+        self.projections += 1
+        frequency = bottom.roll_up(csvtable, key[1])
+        self.put(frequency)
+        return frequency
+
+    def put(self, frequency):
+
+        """
+        Adds a frequency set to the cache, evicting the least recently used ones if the cache
+        exceeds its maximum size. A set larger than the maximum size is not cached.
+
+        :param frequency:   Frequency set to add.
+        """
+
+        key = (frequency.qi_names, frequency.levels)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        if self.max_bytes is not None and frequency.nbytes > self.max_bytes:
+            return
+
+        self._entries[key] = frequency
+        self.bytes += frequency.nbytes
+        if not any(frequency.levels):
+            self._bottoms[frozenset(frequency.qi_names)] = key
+        while self.max_bytes is not None and self.bytes > self.max_bytes:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.evictions += 1
+            if self._bottoms.get(frozenset(evicted.qi_names)) == evicted_key:
+                del self._bottoms[frozenset(evicted.qi_names)]
+
+    def clear(self):
+
+        """
+        Removes all the frequency sets, when the rows of the table change.
+        """
+
+        self._entries.clear()
+        self._bottoms.clear()
+        self.bytes = 0
+
+    def stats(self):
+
+        """
+        Gets the counters of the cache, to size it.
+
+        :return:    Dictionary with the numbers of 'hits', 'projections', 'misses' and
+                    'evictions', the number of cached 'entries' and their size in 'bytes'.
+        """
+
+        return {'hits': self.hits, 'projections': self.projections, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self._entries), 'bytes': self.bytes}
@@ -1,132 +1,195 @@
 import itertools
-import networkx as nx
-import parsing
 
+_MARKED = 1
+_HEREDITARY = 2
+_REJECTED = 4
+_DENSE_FLAGS_LIMIT = 1 << 20
+# Maximum number of nodes of an unrestricted lattice whose flags are stored in a flat array
 
-class MyDiGraph(nx.DiGraph):
 
-    def getVertex(self, comb):
-        return self.nodes[comb]
+class _SparseFlags(dict):
 
-    def getVertices(self):
-        return self.nodes
+    # Flags of the nodes keyed by rank, only the flagged nodes being stored. Reading the flags of
+    # another node gives 0 without storing it.
 
-    def getVerticesAttributes(self):
-        return self.nodes.data()
+    def __missing__(self, rank):
+        return 0
 
-    def getEdges(self):
-        return self.edges
 
-    # works with pointer to tuple
-    def addEdge(self, c1, c2):
-        return self.add_edge(c1, c2)
+class Lattice:
+
+    # Generalization lattice whose nodes are tuples of generalization levels (lv1, lv2, ...).
+    # Edges are never stored: the direct generalizations of a node are computed incrementing
+    # one of its levels. The flags of the nodes are indexed by the rank of the node, its levels
+    # read as the digits of a mixed radix number: in a flat array for small lattices, in a
+    # dictionary of the flagged nodes only for large lattices and for lattices restricted to a
+    # set of candidate nodes.
+
+    def __init__(self, qi_height=(), candidates=None):
+        self.heights = tuple()
+        self.candidates = None
+        self.strides = tuple()
+        self.flags = bytearray()
+        self.marked_tags = list()
+        self.rejected_tags = list()
+        self.add_vertices(qi_height, candidates)
+
+    def rank(self, node):
+        return sum(level * stride for level, stride in zip(node, self.strides))
+
+    def getVertices(self):
+        if self.candidates is not None:
+            return iter(self.candidates)
+        return itertools.product(*(range(h + 1) for h in self.heights))
 
-    def addVertex(self, node):
-        self.add_node(node, is_marked=False)
-        self.add_node(node, is_hereditary=False)
-        return self
+    def getEdges(self):
+        for node in self.getVertices():
+            for child in self.getChildren(node):
+                yield node, child
 
     # Variant from original hasVertex, returns True or False
     def hasVertex(self, a):
-        return self.has_node(a)
+        if self.candidates is not None:
+            return a in self.candidates
+        return len(a) == len(self.heights) and all(0 <= l <= h for l, h in zip(a, self.heights))
 
     def isMarked(self, a):
-        return self.nodes[a]["is_marked"]
+        return bool(self.flags[self.rank(a)] & _MARKED)
 
     def isHereditary(self, a):
-        return self.nodes[a]["is_hereditary"]
+        return bool(self.flags[self.rank(a)] & _HEREDITARY)
 
     def setMarked(self, a):
-        self.nodes[a]["is_marked"] = True
+        self.flags[self.rank(a)] |= _MARKED
 
     def setHereditary(self, a):
-        self.nodes[a]["is_hereditary"] = True
-        
+        self.flags[self.rank(a)] |= _HEREDITARY
+
+    def isRejected(self, a):
+        return bool(self.flags[self.rank(a)] & _REJECTED)
+
+    def setRejected(self, a):
+        self.flags[self.rank(a)] |= _REJECTED
+
+    # marks all the generalizations of a node, direct or not
+    def setGeneralizationsMarked(self, node):
+        flags = self.flags
+        stack = [(child, self.rank(child)) for child in self.getChildren(node)]
+        while stack:
+            n, r = stack.pop()
+            # The generalizations of a marked node are already marked:
+            if flags[r] & _MARKED:
+                continue
+            flags[r] |= _MARKED | _HEREDITARY
+            for index, level in enumerate(n):
+                child = n[:index] + (level + 1,) + n[index + 1:]
+                if self.hasVertex(child):
+                    stack.append((child, r + self.strides[index]))
+
+    # rejects all the specializations of a node, direct or not
+    def setSpecializationsRejected(self, node):
+        flags = self.flags
+        stack = [(parent, self.rank(parent)) for parent in self.getParents(node)]
+        while stack:
+            n, r = stack.pop()
+            # The specializations of a rejected node are already rejected:
+            if flags[r] & _REJECTED:
+                continue
+            flags[r] |= _REJECTED
+            for index, level in enumerate(n):
+                parent = n[:index] + (level - 1,) + n[index + 1:]
+                if self.hasVertex(parent):
+                    stack.append((parent, r - self.strides[index]))
+
+    # Predictive tagging: a checked node tags its generalizations, direct or not, as marked if
+    # it is marked, and its specializations as rejected if it is rejected. In a small lattice
+    # the flags of all of them are set, in a large one the tags are only stored in the flags of
+    # the nodes visited afterwards.
+    def tagMarked(self, node):
+        self.setMarked(node)
+        if isinstance(self.flags, bytearray):
+            self.setGeneralizationsMarked(node)
+        else:
+            self.marked_tags.append(node)
+
+    def tagRejected(self, node):
+        self.setRejected(node)
+        if isinstance(self.flags, bytearray):
+            self.setSpecializationsRejected(node)
+        else:
+            self.rejected_tags.append(node)
+
+    def isTaggedMarked(self, node):
+        if self.isMarked(node):
+            return True
+        if any(all(t <= l for t, l in zip(tag, node)) for tag in self.marked_tags):
+            self.setMarked(node)
+            return True
+        return False
+
+    def isTaggedRejected(self, node):
+        if self.isRejected(node):
+            return True
+        if any(all(l <= t for t, l in zip(tag, node)) for tag in self.rejected_tags):
+            self.setRejected(node)
+            return True
+        return False
+
     def getRoots(self):
-        tmp = []
-        for n, d in self.in_degree():
-            if d == 0:
-                tmp.append(n)
-        return tmp
+        if self.candidates is not None:
+            return sorted(n for n in self.candidates if not self.getParents(n))
+        return [(0,) * len(self.heights)]
 
     def getChildren(self, node):
-        tmp_children = self.out_edges(node)
         children = list()
-        for p,a in tmp_children:
-            children.append(a)
+        for index, level in enumerate(node):
+            child = node[:index] + (level + 1,) + node[index + 1:]
+            if self.hasVertex(child):
+                children.append(child)
         return children
 
+    def getParents(self, node):
+        parents = list()
+        for index, level in enumerate(node):
+            parent = node[:index] + (level - 1,) + node[index + 1:]
+            if self.hasVertex(parent):
+                parents.append(parent)
+        return parents
+
     def printOut(self):
-        for i in self.nodes:
+        for i in self.getVertices():
             print("Node: ", i)
             print("Attributes: ")
-            for j in self.nodes[i]:
-                print("-", j, ": ", self.nodes[i][j])
+            print("-", "is_marked", ": ", self.isMarked(i))
+            print("-", "is_hereditary", ": ", self.isHereditary(i))
 
-            if self.in_degree(i) != 0:
-                print("Parent: ", list(self.in_edges(i))[0][0], "\nChildren: ", end="")
+            if self.getParents(i):
+                print("Parent: ", self.getParents(i)[0], "\nChildren: ", end="")
             else:
                 print("Parent: Is root\nChildren: ", end="")
 
-            if self.out_degree(i) != 0:
-                for a, b in self.out_edges(i):
+            if self.getChildren(i):
+                for b in self.getChildren(i):
                     print(b, end=" ")
                 print("\n")
             else:
                 print("None\n")
 
-    def add_vertices(self, qi_height, qi_names):
-
-        count = range(len(qi_names))
-        listofcomb = list(itertools.product(*qi_height))
-        dictionary = {}
-
-        for combi in listofcomb:
-            for index in count:
-                key = qi_names[index]
-                value = combi[index]
-                dictionary[key] = value
-                if index == (len(qi_names) - 1):
-                    self.addVertex(parsing.reparse_attr(dictionary))
-        return
-
-    # criteria to add edge
-    def add_linked_edge(self, qi_name):
-
-        chars = "({})' "
-
-        attributes = self.getVerticesAttributes()
-        list(attributes)
-        attributes_s = []
-
-        for e in attributes:
-            st = str(e)
-            st_mod = st.translate(str.maketrans('', '', chars))
-            atrs = st_mod.split(",")
-            attributes_s.append(str(atrs[0]))
-
-        combs = {}
-
-        for s in attributes_s:
-            comb = parsing.parse_attr(s)
-
-            combs[s] = comb
-
-        vertices = self.getVertices()
-        temp = 0
-        temp_combs = combs.copy()
-        for q in qi_name:
-            for c in combs:
-                if combs[c].get(q) is not None:
-                    temp = combs[c].get(q)
-                    temp_combs[c][q] = int(temp) + 1
-
-                combination2add = parsing.reparse_attr(temp_combs[c])
-                combs[c][q] = int(temp)
-
-                for v in vertices:
-                    if v == combination2add:
-                        for w in vertices:
-                            if w == c:
-                                self.add_edge(w, v)
+    def add_vertices(self, qi_height, candidates=None):
+
+        # Only the bounds of the lattice are needed, nodes are generated on demand:
+        self.heights = tuple(len(levels) - 1 for levels in qi_height)
+        self.candidates = candidates
+
+        # The last level varies fastest:
+        strides = list()
+        size = 1
+        for height in reversed(self.heights):
+            strides.append(size)
+            size *= height + 1
+        self.strides = tuple(reversed(strides))
+        if candidates is None and size <= _DENSE_FLAGS_LIMIT:
+            self.flags = bytearray(size)
+        else:
+            self.flags = _SparseFlags()
         return
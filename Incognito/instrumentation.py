@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+
+
+class Instrumentation:
+
+    def __init__(self, callback=None):
+
+        """
+        Collects the timings of the phases of an anonymization and its counters, such as the
+        number of lattice nodes evaluated, optionally notifying them to a callback as they come.
+
+        :param callback:    Function called with the kind of the measure ('phase' or
+                            'counter'), its name, its key (None if it has none) and its value,
+                            None not to be notified.
+        """
+
+        self.timings = dict()
+        """
+        Dictionary whose keys are the names of the phases and whose values are their seconds, or
+        dictionaries mapping keys, like the size of the QI subsets, to seconds.
+        """
+        self.counters = dict()
+        """
+        Dictionary whose keys are the names of the counters and whose values are their values,
+        or dictionaries mapping keys, like the size of the QI subsets, to values.
+        """
+        self.callback = callback
+
+    @staticmethod
+    def _add(measures, name, key, value):
+
+        if key is None:
+            measures[name] = measures.get(name, 0) + value
+        else:
+            measures.setdefault(name, dict())
+            measures[name][key] = measures[name].get(key, 0) + value
+
+    @contextmanager
+    def phase(self, name, key=None):
+
+        """
+        Measures the wall time of a block of code, adding it to the time of a phase.
+
+        :param name:    Name of the phase.
+        :param key:     Key of the measure within the phase, None if it has none.
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._add(self.timings, name, key, seconds)
+            if self.callback is not None:
+                self.callback('phase', name, key, seconds)
+
+    def count(self, name, value=1, key=None):
+
+        """
+        Adds a value to a counter.
+
+        :param name:    Name of the counter.
+        :param value:   Value to add.
+        :param key:     Key of the measure within the counter, None if it has none.
+        """
+
+        self._add(self.counters, name, key, value)
+        if self.callback is not None:
+            self.callback('counter', name, key, value)
+
+    def report(self):
+
+        """
+        Gets all the measures, in a format which can be written as JSON.
+
+        :return:    Dictionary with the 'timings' and the 'counters', whose keys are strings.
+        """
+
+        def stringify(measures):
+            return {name: {str(key): value for key, value in value.items()}
+                    if isinstance(value, dict) else value
+                    for name, value in measures.items()}
+
+        return {'timings': stringify(self.timings), 'counters': stringify(self.counters)}
@@ -0,0 +1,94 @@
+import numpy as np
+
+
+def height(csvtable, qi_names, node, counts, k):
+
+    """
+    Information loss measured as the height of the node in the lattice, the sum of its
+    generalization levels.
+
+    :param csvtable:    Anonymized table.
+    :param qi_names:    Names of the QI, ordered as the node levels.
+    :param node:        Generalization levels of the node.
+    :param counts:      Array of the sizes of the equivalence classes of the node.
+    :param k:           Level of anonymity.
+    :return:            The height of the node.
+    """
+
+    return sum(node)
+
+
+def precision(csvtable, qi_names, node, counts, k):
+
+    """
+    Information loss measured as one minus the precision of Sweeney: the mean, over the QI, of
+    the generalization level divided by the height of the hierarchy.
+
+    :param csvtable:    Anonymized table.
+    :param qi_names:    Names of the QI, ordered as the node levels.
+    :param node:        Generalization levels of the node.
+    :param counts:      Array of the sizes of the equivalence classes of the node.
+    :param k:           Level of anonymity.
+    :return:            The loss of precision, between 0 and 1.
+    """
+
+    loss = 0.
+    for qi, level in zip(qi_names, node):
+        tree_height = csvtable.dghs[qi].get_tree_height()
+        if tree_height > 0:
+            loss += level / tree_height
+    return loss / len(node)
+
+
+def discernibility(csvtable, qi_names, node, counts, k):
+
+    """
+    Discernibility metric: every row is penalized by the size of its equivalence class, and
+    every row of a class smaller than k, which cannot be told apart from the rest of the table,
+    by the size of the table.
+
+    :param csvtable:    Anonymized table.
+    :param qi_names:    Names of the QI, ordered as the node levels.
+    :param node:        Generalization levels of the node.
+    :param counts:      Array of the sizes of the equivalence classes of the node.
+    :param k:           Level of anonymity.
+    :return:            The discernibility of the node.
+    """
+
+    counts = counts.astype(np.int64)
+    small = counts < k
+    return int((counts[~small] ** 2).sum()) + int(counts[small].sum()) * csvtable.size
+
+
+def average_class_size(csvtable, qi_names, node, counts, k):
+
+    """
+    Normalized average equivalence class size: the average size of the classes divided by k,
+    1 being the best possible value. The classes smaller than k, which are suppressed, are not
+    counted.
+
+    :param csvtable:    Anonymized table.
+    :param qi_names:    Names of the QI, ordered as the node levels.
+    :param node:        Generalization levels of the node.
+    :param counts:      Array of the sizes of the equivalence classes of the node.
+    :param k:           Level of anonymity.
+    :return:            The normalized average class size.
+    """
+
+    kept = counts[counts >= k]
+    if len(kept) == 0:
+        return float('inf')
+    return int(kept.sum()) / len(kept) / k
+
+
+METRICS = {
+    'height': height,
+    'precision': precision,
+    'discernibility': discernibility,
+    'average_class_size': average_class_size,
+}
+"""
+Dictionary whose keys are the names of the information loss metrics and whose values are the
+corresponding functions. A metric is called with the table, the QI names, the levels of a node,
+the sizes of its equivalence classes and k, and the node with the lowest value is the best one.
+"""
@@ -0,0 +1,183 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class SharedTable:
+
+    def __init__(self, csvtable, attributes):
+
+        """
+        Copies the encoded columns of a table to shared memory, together with the generalization
+        codes of the given attributes, so that worker processes can read them without receiving
+        a copy of the columns with every task.
+
+        :param csvtable:    Table to share.
+        :param attributes:  Names of the attributes with a DGH to share.
+        :raises KeyError:   If an attribute name is not valid.
+        """
+
+        self.columns = dict()
+        """
+        Dictionary whose keys are the attributes names and whose values are arrays, backed by
+        shared memory, with the codes of the values of the columns.
+        """
+        self.values = {attribute: csvtable.values[attribute] for attribute in attributes}
+        self.gen_codes = {attribute: csvtable.gen_codes[attribute] for attribute in attributes}
+        self.gen_values = {attribute: csvtable.gen_values[attribute] for attribute in attributes}
+        self.gen_nested = {attribute: csvtable.gen_nested[attribute] for attribute in attributes}
+        self._blocks = dict()
+        """
+        Dictionary whose keys are the attributes names and whose values are the shared memory
+        blocks of the columns.
+        """
+        self.weights = None
+        """
+        Array, backed by shared memory, of the number of rows of the table each row of the
+        columns stands for, None if every row stands for itself.
+        """
+        self._owner = True
+
+        for attribute in attributes:
+            self.columns[attribute] = self._share(attribute, csvtable.columns[attribute])
+        if csvtable.weights is not None:
+            self.weights = self._share(None, csvtable.weights)
+
+    def __getstate__(self):
+
+        # Only the names of the shared memory blocks are sent to the workers:
+        state = self.__dict__.copy()
+        state['columns'] = {attribute: self._describe(attribute, column)
+                            for attribute, column in self.columns.items()}
+        if self.weights is not None:
+            state['weights'] = self._describe(None, self.weights)
+        state['_blocks'] = None
+        return state
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+        self._owner = False
+        self._blocks = dict()
+
+        for attribute, description in state['columns'].items():
+            self.columns[attribute] = self._attach(attribute, *description)
+        if state['weights'] is not None:
+            self.weights = self._attach(None, *state['weights'])
+
+    def _share(self, key, array):
+
+        """
+        Copies an array to a new shared memory block.
+
+        :param key:     Key of the block, the name of the attribute of the array.
+        :param array:   Array to copy.
+        :return:        The array backed by shared memory.
+        """
+
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._blocks[key] = block
+        shared_array = np.ndarray(array.shape, array.dtype, buffer=block.buf)
+        shared_array[:] = array
+        return shared_array
+
+    def _describe(self, key, array):
+
+        return self._blocks[key].name, array.shape, array.dtype
+
+    def _attach(self, key, name, shape, dtype):
+
+        """
+        Attaches to an array stored in a shared memory block by another process.
+
+        :param key:     Key of the block, the name of the attribute of the array.
+        :param name:    Name of the shared memory block.
+        :param shape:   Shape of the array.
+        :param dtype:   Type of the array items.
+        :return:        The array backed by shared memory.
+        """
+
+        # The blocks are released by the process that created them, not by the workers:
+        block = shared_memory.SharedMemory(name=name)
+        self._blocks[key] = block
+        return np.ndarray(shape, dtype, buffer=block.buf)
+
+    def close(self):
+
+        """
+        Releases the shared memory blocks, destroying them if they have been created by this
+        process.
+        """
+
+        self.columns = dict()
+        self.weights = None
+        for block in self._blocks.values():
+            block.close()
+            if self._owner:
+                block.unlink()
+        self._blocks = dict()
+
+
+_table = None
+"""
+Shared table of the worker process.
+"""
+
+
+def _init_worker(table):
+
+    global _table
+    _table = table
+
+
+def _call(function, *args):
+
+    return function(_table, *args)
+
+
+class WorkerPool:
+
+    def __init__(self, csvtable, attributes, workers):
+
+        """
+        Pool of worker processes sharing the encoded columns of a table.
+
+        :param csvtable:    Table to share.
+        :param attributes:  Names of the attributes with a DGH needed by the workers.
+        :param workers:     Number of worker processes.
+        """
+
+        self.table = SharedTable(csvtable, attributes)
+        self.executor = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                            initargs=(self.table,))
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def map(self, function, *iterables):
+
+        """
+        Calls a function in the workers for every item of the iterables, like the map built-in.
+
+        :param function:    Function whose first argument is the shared table, followed by one
+                            argument from every iterable. It must be defined at module level.
+        :param iterables:   Iterables of the other arguments of the function.
+        :return:            Iterator over the results, in order.
+        """
+
+        return self.executor.map(_call, repeat(function), *iterables)
+
+    def close(self):
+
+        """
+        Waits for the workers and releases the shared table.
+        """
+
+        self.executor.shutdown()
+        self.table.close()